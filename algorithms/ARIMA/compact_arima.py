@@ -0,0 +1,240 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class CompactARIMA:
+    """Forecast-only ARIMA model: order, parameters and the final Kalman filter state.
+
+    A pickled statsmodels results object carries the training data, the
+    filtered/smoothed state for every observation and the parameter
+    covariance (~3 MB per ticker). Forecasting only needs the state-space
+    system matrices and the one-step-ahead predicted state after the last
+    observation, which is a few hundred bytes.
+
+    `transform` records what the model was fit on: 'log' (log prices) or
+    'log_diff' (daily log returns); forecast_price() and append_prices()
+    use it to convert between prices and model observations.
+    """
+
+    def __init__(self, order, params, param_names, design, obs_intercept, obs_cov,
+                 transition, state_intercept, selection, state_cov,
+                 state, state_cov_pred, nobs, last_date=None, freq=None, transform=None):
+        self.order = tuple(int(x) for x in order)
+        self.params = np.asarray(params, dtype=float)
+        self.param_names = [str(name) for name in param_names]
+        self.design = np.asarray(design, dtype=float)
+        self.obs_intercept = np.asarray(obs_intercept, dtype=float)
+        self.obs_cov = np.asarray(obs_cov, dtype=float)
+        self.transition = np.asarray(transition, dtype=float)
+        self.state_intercept = np.asarray(state_intercept, dtype=float)
+        self.selection = np.asarray(selection, dtype=float)
+        self.state_cov = np.asarray(state_cov, dtype=float)
+        self.state = np.asarray(state, dtype=float)
+        self.state_cov_pred = np.asarray(state_cov_pred, dtype=float)
+        self.nobs = int(nobs)
+        self.last_date = pd.Timestamp(last_date) if last_date else None
+        self.freq = freq or None
+        self.transform = transform or None
+
+    @classmethod
+    def from_results(cls, results, transform=None):
+        """Extract the compact state from a fitted statsmodels ARIMA results object"""
+        model = results.model
+        if model.trend not in ('n', 'c', None):
+            raise ValueError(f"Only constant trends are supported, got trend={model.trend!r}")
+
+        ssm = model.ssm
+
+        def last(name, time_invariant_ndim):
+            # Time-varying system arrays carry a trailing nobs axis; the
+            # constant trend makes obs_intercept time-varying but identical
+            # at every step, so the last slice is the one to forecast with
+            value = np.asarray(ssm[name])
+            return value[..., -1] if value.ndim > time_invariant_ndim else value
+
+        index = model._index
+        last_date = None
+        freq = None
+        if isinstance(index, pd.DatetimeIndex):
+            last_date = index[-1]
+            freq = index.freqstr
+
+        return cls(
+            order=model.order,
+            params=results.params,
+            param_names=model.param_names,
+            design=last('design', 2),
+            obs_intercept=last('obs_intercept', 1),
+            obs_cov=last('obs_cov', 2),
+            transition=last('transition', 2),
+            state_intercept=last('state_intercept', 1),
+            selection=last('selection', 2),
+            state_cov=last('state_cov', 2),
+            state=results.predicted_state[:, -1],
+            state_cov_pred=results.predicted_state_cov[:, :, -1],
+            nobs=results.nobs,
+            last_date=last_date,
+            freq=freq,
+            transform=transform,
+        )
+
+    def _forecast_index(self, steps):
+        if self.last_date is not None and self.freq:
+            return pd.date_range(self.last_date, periods=steps + 1, freq=self.freq)[1:]
+        return pd.RangeIndex(self.nobs, self.nobs + steps)
+
+    def forecast(self, steps=1):
+        """Point forecasts for the next `steps` periods, like ARIMAResults.forecast"""
+        state = self.state
+        values = np.empty(steps)
+        for h in range(steps):
+            values[h] = (self.design @ state + self.obs_intercept)[0]
+            state = self.transition @ state + self.state_intercept
+        return pd.Series(values, index=self._forecast_index(steps), name='predicted_mean')
+
+    def append(self, endog):
+        """Filter new observations into the state without refitting the parameters.
+
+        One Kalman filter step per observation with the stored system
+        matrices, as ARIMAResults.append(endog, refit=False) would do; NaN
+        observations only advance the state. A pd.Series with a DatetimeIndex
+        also moves last_date to its last date.
+        """
+        Z, d, H = self.design, self.obs_intercept, self.obs_cov
+        T, c = self.transition, self.state_intercept
+        RQR = self.selection @ self.state_cov @ self.selection.T
+        state, P = self.state, self.state_cov_pred
+        for y in np.atleast_1d(np.asarray(endog, dtype=float)):
+            if not np.isnan(y):
+                F = Z @ P @ Z.T + H
+                if F[0, 0] > 0:
+                    gain = P @ Z.T / F[0, 0]
+                    state = state + gain[:, 0] * (y - (Z @ state + d)[0])
+                    P = P - gain @ Z @ P
+            state = T @ state + c
+            P = T @ P @ T.T + RQR
+        self.state, self.state_cov_pred = state, P
+        self.nobs += len(np.atleast_1d(endog))
+
+        if isinstance(endog, pd.Series) and isinstance(endog.index, pd.DatetimeIndex) and len(endog):
+            self.last_date = endog.index[-1]
+        elif self.last_date is not None and self.freq:
+            self.last_date = self._forecast_index(len(np.atleast_1d(endog)))[-1]
+        return self
+
+    def _require_transform(self):
+        if self.transform not in ('log', 'log_diff'):
+            raise ValueError("Model has no recorded transform; retrain it or add a transform "
+                             "column to trained_models_info.csv")
+
+    def forecast_price(self, last_price):
+        """One-step forecast converted to a price, given the price at the last observation"""
+        self._require_transform()
+        forecast = self.forecast(steps=1).iloc[0]
+        if self.transform == 'log':
+            return float(np.exp(forecast))
+        return float(last_price * np.exp(forecast))
+
+    def append_prices(self, prices, prev_price):
+        """append() prices, converted to the model's observations; `prev_price` precedes prices[0]"""
+        self._require_transform()
+        log_prices = np.log(np.asarray(prices, dtype=float))
+        if self.transform == 'log':
+            endog = log_prices
+        else:
+            endog = np.diff(log_prices, prepend=np.log(prev_price))
+        if isinstance(prices, pd.Series):
+            endog = pd.Series(endog, index=prices.index)
+        return self.append(endog)
+
+    def save(self, path):
+        """Write the model to an .npz file (no pickle)"""
+        np.savez(
+            path,
+            order=np.array(self.order),
+            params=self.params,
+            param_names=np.array(self.param_names),
+            design=self.design,
+            obs_intercept=self.obs_intercept,
+            obs_cov=self.obs_cov,
+            transition=self.transition,
+            state_intercept=self.state_intercept,
+            selection=self.selection,
+            state_cov=self.state_cov,
+            state=self.state,
+            state_cov_pred=self.state_cov_pred,
+            nobs=np.array(self.nobs),
+            last_date=np.array(self.last_date.isoformat() if self.last_date is not None else ''),
+            freq=np.array(self.freq or ''),
+            transform=np.array(self.transform or ''),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            fields = {name: data[name] for name in data.files}
+        fields['last_date'] = str(fields['last_date']) or None
+        fields['freq'] = str(fields['freq']) or None
+        fields['transform'] = str(fields.get('transform', '')) or None
+        fields['nobs'] = int(fields['nobs'])
+        return cls(**fields)
+
+    @property
+    def nbytes(self):
+        return sum(np.asarray(value).nbytes for value in vars(self).values()
+                   if isinstance(value, np.ndarray))
+
+
+def compact_model_path(ticker, models_dir='../../data/arima/models'):
+    return os.path.join(models_dir, f'{ticker}_arima_model.npz')
+
+
+def recorded_transform(ticker, models_dir='../../data/arima/models'):
+    """The ticker's transform from trained_models_info.csv (next to models_dir), or None"""
+    info_path = os.path.join(models_dir, '..', 'trained_models_info.csv')
+    if not os.path.exists(info_path):
+        return None
+    info = pd.read_csv(info_path)
+    if 'transform' not in info:
+        return None
+    row = info.loc[info['ticker'] == ticker, 'transform'].dropna()
+    return str(row.iloc[0]) if len(row) else None
+
+
+def load_compact_model(ticker, models_dir='../../data/arima/models'):
+    """Load a ticker's CompactARIMA, falling back to compacting a full-results pickle
+
+    Models saved without a transform take it from trained_models_info.csv.
+    """
+    path = compact_model_path(ticker, models_dir)
+    if os.path.exists(path):
+        model = CompactARIMA.load(path)
+    else:
+        import pickle
+
+        with open(os.path.join(models_dir, f'{ticker}_arima_model.pkl'), 'rb') as f:
+            model = CompactARIMA.from_results(pickle.load(f))
+    if model.transform is None:
+        model.transform = recorded_transform(ticker, models_dir)
+    return model
+
+
+def convert_pickled_models(models_dir='../../data/arima/models'):
+    """Write a compact .npz next to every pickled full-results model"""
+    import pickle
+
+    for pkl_path in sorted(glob.glob(os.path.join(models_dir, '*_arima_model.pkl'))):
+        with open(pkl_path, 'rb') as f:
+            results = pickle.load(f)
+        npz_path = pkl_path[:-len('.pkl')] + '.npz'
+        ticker = os.path.basename(pkl_path)[:-len('_arima_model.pkl')]
+        CompactARIMA.from_results(results, recorded_transform(ticker, models_dir)).save(npz_path)
+        print(f"✓ {os.path.basename(pkl_path)} ({os.path.getsize(pkl_path) / 1e6:.1f} MB) -> "
+              f"{os.path.basename(npz_path)} ({os.path.getsize(npz_path) / 1e3:.1f} kB)")
+
+
+if __name__ == "__main__":
+    convert_pickled_models()
@@ -2,112 +2,211 @@ import pandas as pd
 import numpy as np
 from statsmodels.tsa.arima.model import ARIMA
 from statsmodels.tsa.stattools import adfuller
+from multiprocessing import Pool
+import argparse
 import pickle
 import os
+import sys
+import time
 import warnings
 warnings.filterwarnings('ignore')
 
-def train_and_save_arima_models():
-    """Train ARIMA models for all tickers and save them"""
-    print("Training ARIMA models for all tickers...")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from algorithms.ARIMA.compact_arima import CompactARIMA, compact_model_path
+from algorithms.model_registry import arima_registry
+from price_store import open_matrix_cache
+
+# Shared by load_trained_model so repeated lookups don't reopen the file
+trained_models = arima_registry(max_models=256)
+
+# Candidate orders tried by find_best_arima_order
+ORDERS_TO_TEST = [(1,1,1), (1,1,0), (0,1,1), (2,1,1), (1,1,2), (2,1,2), (1,0,1), (2,0,1)]
+
+def prepare_train_data(ticker, ticker_data):
+    """Log-transform the training split and difference it if it is not stationary
+    
+    Returns (train_data, transform), transform being 'log' or 'log_diff'.
+    """
+    ticker_data = ticker_data.copy()
+    ticker_data['date'] = pd.to_datetime(ticker_data['date'])
+    ticker_data = ticker_data.sort_values('date')
+    
+    # Set datetime index with business day frequency
+    ticker_data = ticker_data.set_index('date')
+    ticker_data.index.freq = 'B'  # Business day frequency
+    train_size = int(len(ticker_data) * 0.8)
+    
+    # Use log transformation for better stationarity
+    log_prices = np.log(ticker_data['adj_close_price'])
+    train_data = log_prices[:train_size]
+    
+    # Check stationarity
+    adf_result = adfuller(train_data.dropna())
+    is_stationary = adf_result[1] < 0.05
+    print(f"{ticker}: Stationary = {is_stationary} (p-value: {adf_result[1]:.4f})")
+    
+    # If not stationary, difference the data
+    if not is_stationary:
+        train_data = train_data.diff().dropna()
+    return train_data, 'log' if is_stationary else 'log_diff'
+
+def fit_candidate(task):
+    """Fit one (ticker, order) candidate; return (ticker, order, aic or None, seconds)"""
+    warnings.filterwarnings('ignore')
+    ticker, order, data = task
+    start = time.perf_counter()
+    try:
+        model = ARIMA(data, order=order)
+        fitted = model.fit(method_kwargs={'warn_convergence': False})
+        aic = fitted.aic
+    except:
+        aic = None
+    return ticker, order, aic, time.perf_counter() - start
+
+def fit_and_save(task):
+    """Fit the chosen order for a ticker, save it and return its info row
+    
+    Only the compact forecast state is written unless full_pickle is set,
+    in which case the whole statsmodels results object is pickled as well.
+    """
+    warnings.filterwarnings('ignore')
+    ticker, best_order, (data, transform), full_pickle = task
+    start = time.perf_counter()
+    try:
+        model = ARIMA(data, order=best_order)
+        fitted_model = model.fit()
+        
+        model_path = compact_model_path(ticker)
+        CompactARIMA.from_results(fitted_model, transform).save(model_path)
+        if full_pickle:
+            with open(f'../../data/arima/models/{ticker}_arima_model.pkl', 'wb') as f:
+                pickle.dump(fitted_model, f)
+        
+        info = {
+            'ticker': ticker,
+            'order': best_order,
+            'aic': fitted_model.aic,
+            'transform': transform,
+            'train_size': len(data),
+            'model_path': model_path
+        }
+    except Exception as e:
+        print(f"✗ {ticker}: Error - {e}")
+        info = {
+            'ticker': ticker,
+            'order': None,
+            'aic': None,
+            'transform': None,
+            'train_size': 0,
+            'model_path': None
+        }
+    return info, time.perf_counter() - start
+
+def train_and_save_arima_models(workers=1, full_pickle=False):
+    """Train ARIMA models for all tickers and save them.
+    
+    The candidate-order search and the final fits are independent per
+    (ticker, order), so with workers > 1 they are fanned out over a process
+    pool; the best AIC per ticker is picked once all its candidates are back.
+    """
+    print(f"Training ARIMA models for all tickers ({workers} worker{'s' if workers != 1 else ''})...")
+    run_start = time.perf_counter()
     
-    # Load data
-    df = pd.read_csv('../../data/processed_tech_stock_data.csv')
-    tickers = df['ticker'].unique()
+    # Load data (memory-mapped dates x tickers matrix)
+    cache = open_matrix_cache()
+    tickers = cache.tickers
     
     # Create models directory
     os.makedirs('../../data/arima/models', exist_ok=True)
-    model_info = []
+    model_info = {}
+    fit_seconds = {ticker: 0.0 for ticker in tickers}
     
+    train_sets = {}
     for ticker in tickers:
-        print(f"Training ARIMA model for {ticker}...")
         try:
-            # Get ticker data
-            ticker_data = df[df['ticker'] == ticker].copy()
-            ticker_data['date'] = pd.to_datetime(ticker_data['date'])
-            ticker_data = ticker_data.sort_values('date')
-            
-            # Set datetime index with business day frequency
-            ticker_data = ticker_data.set_index('date')
-            ticker_data.index.freq = 'B'  # Business day frequency
-            train_size = int(len(ticker_data) * 0.8)
-            
-            # Use log transformation for better stationarity
-            log_prices = np.log(ticker_data['adj_close_price'])
-            train_data = log_prices[:train_size]
-            
-            # Check stationarity
-            adf_result = adfuller(train_data.dropna())
-            is_stationary = adf_result[1] < 0.05
-            print(f"{ticker}: Stationary = {is_stationary} (p-value: {adf_result[1]:.4f})")
-            
-            # If not stationary, difference the data
-            if not is_stationary:
-                train_data = train_data.diff().dropna()
-            
-            best_order = find_best_arima_order(train_data)
-            model = ARIMA(train_data, order=best_order)
-            fitted_model = model.fit()
-            
-            model_path = f'../../data/arima/models/{ticker}_arima_model.pkl'
-            with open(model_path, 'wb') as f:
-                pickle.dump(fitted_model, f)
-            
-            # Save model info
-            model_info.append({
-                'ticker': ticker,
-                'order': best_order,
-                'aic': fitted_model.aic,
-                'train_size': len(train_data),
-                'model_path': model_path
-            })
-            print(f"✓ {ticker}: ARIMA{best_order}, AIC: {fitted_model.aic:.2f}")
-            
+            dates, prices = cache.series(ticker, 'adj_close_price')
+            ticker_data = pd.DataFrame({'date': dates, 'adj_close_price': prices})
+            train_sets[ticker] = prepare_train_data(ticker, ticker_data)
         except Exception as e:
             print(f"✗ {ticker}: Error - {e}")
-            model_info.append({
-                'ticker': ticker,
-                'order': None,
-                'aic': None,
-                'train_size': 0,
-                'model_path': None
-            })
+            model_info[ticker] = {'ticker': ticker, 'order': None, 'aic': None, 'transform': None,
+                                  'train_size': 0, 'model_path': None}
+    
+    pool = Pool(workers) if workers > 1 else None
+    imap = pool.imap_unordered if pool else map
+    try:
+        # 1. Candidate order search, best AIC per ticker
+        tasks = [(ticker, order, data) for ticker, (data, _) in train_sets.items() for order in ORDERS_TO_TEST]
+        best = {ticker: (float('inf'), (1, 1, 1)) for ticker in train_sets}
+        for ticker, order, aic, seconds in imap(fit_candidate, tasks):
+            fit_seconds[ticker] += seconds
+            # Ties keep the earlier candidate, as in the serial search
+            best_aic, best_order = best[ticker]
+            if aic is not None and (aic < best_aic or (aic == best_aic and
+                                    ORDERS_TO_TEST.index(order) < ORDERS_TO_TEST.index(best_order))):
+                best[ticker] = (aic, order)
+        
+        # 2. Final fit with the chosen order
+        tasks = [(ticker, best[ticker][1], data, full_pickle) for ticker, data in train_sets.items()]
+        for done, (info, seconds) in enumerate(imap(fit_and_save, tasks), 1):
+            ticker = info['ticker']
+            fit_seconds[ticker] += seconds
+            model_info[ticker] = info
+            if info['order'] is not None:
+                print(f"[{done}/{len(tasks)}] ✓ {ticker}: ARIMA{info['order']}, AIC: {info['aic']:.2f} "
+                      f"({fit_seconds[ticker]:.1f}s)")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
     
-    # Save model info
-    model_df = pd.DataFrame(model_info)
+    # Save model info (in ticker order, with per-ticker fit time)
+    model_df = pd.DataFrame([model_info[ticker] for ticker in tickers])
+    model_df['train_seconds'] = [round(fit_seconds[ticker], 3) for ticker in tickers]
     model_df.to_csv('../../data/arima/trained_models_info.csv', index=False)
-    print(f"\n✓ Trained {len([m for m in model_info if m['order'] is not None])} ARIMA models")
+    trained_models.clear()  # drop anything loaded before this retrain
+    print(f"\n✓ Trained {model_df['order'].notna().sum()} ARIMA models "
+          f"in {time.perf_counter() - run_start:.1f}s")
     print("Models saved in data/arima/models/")
     return model_df
 
+def refit_arima(model, prices):
+    """Re-estimate a CompactARIMA's parameters on `prices`, keeping its order and transform
+    
+    Used by the walk-forward backtest for its periodic refits; the returned
+    model's state is filtered through the last of `prices`.
+    """
+    warnings.filterwarnings('ignore')
+    log_prices = np.log(np.asarray(prices, dtype=float))
+    data = log_prices if model.transform == 'log' else np.diff(log_prices)
+    fitted_model = ARIMA(data, order=model.order).fit()
+    refitted = CompactARIMA.from_results(fitted_model, model.transform)
+    refitted.last_date, refitted.freq = model.last_date, model.freq
+    return refitted
+
 def find_best_arima_order(data):
     """Find best ARIMA order using manual search with log-transformed data"""
     best_aic = float('inf')
     best_order = (1, 1, 1)
     
     # Test common ARIMA configurations
-    orders_to_test = [(1,1,1), (1,1,0), (0,1,1), (2,1,1), (1,1,2), (2,1,2), (1,0,1), (2,0,1)]
-    
-    for order in orders_to_test:
-        try:
-            model = ARIMA(data, order=order)
-            fitted = model.fit(method_kwargs={'warn_convergence': False})
-            if fitted.aic < best_aic:
-                best_aic = fitted.aic
-                best_order = order
-        except:
-            continue
+    for order in ORDERS_TO_TEST:
+        _, _, aic, _ = fit_candidate((None, order, data))
+        if aic is not None and aic < best_aic:
+            best_aic = aic
+            best_order = order
     
     return best_order
 
 def load_trained_model(ticker):
-    """Load pre-trained ARIMA model"""
-    model_path = f'../../data/arima/models/{ticker}_arima_model.pkl'
-    try:
-        with open(model_path, 'rb') as f:
-            return pickle.load(f)
-    except:
-        return None
+    """Load pre-trained ARIMA model (compact forecast-only form)"""
+    return trained_models.get(ticker)
 
 if __name__ == "__main__":
-    train_and_save_arima_models()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train one ARIMA model per ticker")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of processes for the (ticker, order) fits (default: 1)")
+    parser.add_argument('--full-pickle', action='store_true',
+                        help="also pickle the full statsmodels results (~3 MB per ticker)")
+    args = parser.parse_args()
+    train_and_save_arima_models(workers=args.workers, full_pickle=args.full_pickle)
@@ -0,0 +1,600 @@
+import copy
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+import matplotlib.pyplot as plt
+
+
+class PriceMatrix:
+    """Prices pivoted once into a dates x tickers array"""
+
+    def __init__(self, dates, tickers, prices, present):
+        self.dates = dates
+        self.tickers = tickers
+        self.prices = prices
+        self.present = present
+        self.ticker_index = {ticker: j for j, ticker in enumerate(tickers)}
+
+    def rows_from(self, start):
+        """Return a view of the matrix starting at date row `start`"""
+        return PriceMatrix(self.dates[start:], self.tickers,
+                           self.prices[start:], self.present[start:])
+
+    def history(self, t, j):
+        """Prices of column j up to and including row t, skipping missing bars"""
+        return self.prices[:t + 1, j][self.present[:t + 1, j]]
+
+
+def build_price_matrix(df, column='adj_close_price'):
+    """Pivot the long ticker/date frame into a PriceMatrix.
+
+    Tickers keep their first-seen order (same as df['ticker'].unique()) and
+    `present` marks which (date, ticker) cells had a row, so a missing bar
+    can be told apart from a NaN price.
+    """
+    tickers = df['ticker'].unique()
+    dates = pd.DatetimeIndex(df['date'].unique()).sort_values()
+
+    rows = df.drop_duplicates(['date', 'ticker'], keep='first')
+    date_pos = dates.get_indexer(rows['date'])
+    ticker_pos = pd.Index(tickers).get_indexer(rows['ticker'])
+
+    prices = np.full((len(dates), len(tickers)), np.nan)
+    present = np.zeros((len(dates), len(tickers)), dtype=bool)
+    prices[date_pos, ticker_pos] = rows[column].to_numpy(dtype=float)
+    present[date_pos, ticker_pos] = True
+
+    return PriceMatrix(dates, tickers, prices, present)
+
+
+def matrix_from_cache(cache, column='adj_close_price'):
+    """PriceMatrix over the memory-mapped arrays of a price_store.MatrixCache.
+
+    Nothing is copied; `source` lets worker processes reopen the same files.
+    """
+    matrix = PriceMatrix(cache.dates, np.array(cache.tickers, dtype=object),
+                         cache[column], cache['present'])
+    matrix.source = (cache.cache_dir, column)
+    return matrix
+
+
+# ---------------------------------------------------------------------------
+# Signal providers
+# ---------------------------------------------------------------------------
+
+class SignalProvider:
+    """Supplies one signal value per (date row, ticker column) bar"""
+
+    def prepare(self, matrix):
+        """Called once with the full price matrix before the backtest starts"""
+        self.matrix = matrix
+
+    def at(self, t, j):
+        raise NotImplementedError
+
+
+class ArraySignal(SignalProvider):
+    """Provider whose values are precomputed as a whole dates x tickers array"""
+
+    def prepare(self, matrix):
+        self.matrix = matrix
+        self.values = self.compute(matrix)
+
+    def compute(self, matrix):
+        raise NotImplementedError
+
+    def at(self, t, j):
+        return self.values[t, j]
+
+
+def training_cutoff(n_bars):
+    """Number of a ticker's own bars its model was trained on (the first 80%)"""
+    return int(n_bars * 0.8)
+
+
+def arima_forecasts(models, matrix):
+    """One-step price forecast per ticker from the frozen models (NaN if forecasting fails).
+
+    Each forecast is converted from the model's log scale to a price, using
+    the ticker's last training price. `models` is a dict or ModelRegistry;
+    tickers without a model are skipped.
+    """
+    forecasts = {}
+    for j, ticker in enumerate(matrix.tickers):
+        model = models.get(ticker)
+        if not model:
+            continue
+        try:
+            history = matrix.history(len(matrix.dates) - 1, j)
+            forecasts[ticker] = model.forecast_price(history[training_cutoff(len(history)) - 1])
+        except:
+            forecasts[ticker] = np.nan
+    return forecasts
+
+
+def arima_walk_forward_forecasts(models, matrix, start, refit_every=0, refit=None):
+    """Per-ticker arrays of next-bar price forecasts, updated every bar.
+
+    Each model's state is advanced from its training cutoff with
+    CompactARIMA.append, one close at a time, so forecasts[ticker][t] is
+    the price expected for the bar after t using bars up to t only (NaN
+    before `start`). With refit_every > 0, `refit(model, prices)` re-estimates
+    the parameters on all of the ticker's prices so far every refit_every
+    bars. A ticker whose update or forecast fails keeps all-NaN forecasts.
+    The models in `models` are left untouched.
+    """
+    forecasts = {}
+    appends = refits = 0
+    started = time.perf_counter()
+    for j, ticker in enumerate(matrix.tickers):
+        model = models.get(ticker)
+        if not model:
+            continue
+        rows = np.flatnonzero(matrix.present[:, j])
+        prices = np.asarray(matrix.prices[rows, j], dtype=float)
+        cutoff = training_cutoff(len(rows))
+        if cutoff < 2:
+            continue
+
+        values = np.full(len(matrix.dates), np.nan)
+        try:
+            model = copy.deepcopy(model)
+            # Catch up from the training cutoff to the last bar before the backtest
+            first = max(int(np.searchsorted(rows, start)), cutoff)
+            if first > cutoff:
+                model.append_prices(prices[cutoff:first], prices[cutoff - 1])
+                appends += first - cutoff
+
+            since_refit = 0
+            for i in range(first, len(rows)):
+                model.append_prices(prices[i:i + 1], prices[i - 1])
+                appends += 1
+                since_refit += 1
+                if refit_every and refit is not None and since_refit >= refit_every:
+                    try:
+                        model = refit(model, prices[:i + 1])
+                        refits += 1
+                    except Exception as e:
+                        print(f"✗ {ticker}: Refit error - {e}")
+                    since_refit = 0
+                values[rows[i]] = model.forecast_price(prices[i])
+        except Exception as e:
+            # Like arima_forecasts: the ticker keeps NaN forecasts and never trades
+            print(f"✗ {ticker}: Walk-forward error - {e}")
+            values[:] = np.nan
+        forecasts[ticker] = values
+
+    print(f"Walk-forward ARIMA: {len(forecasts)} tickers, {appends} state updates, "
+          f"{refits} refits in {time.perf_counter() - started:.1f}s")
+    return forecasts
+
+
+class ArimaVoteSignal(ArraySignal):
+    """ARIMA + Bollinger Bands + RSI majority vote: +1 BUY, -1 SELL, 0 HOLD.
+
+    The bands and the RSI only depend on the training rows and are computed
+    once per ticker. `forecasts` maps ticker -> forecast price, either one
+    value for the whole test period (frozen models, see arima_forecasts) or
+    an array over the matrix rows (see arima_walk_forward_forecasts); the
+    ARIMA vote is the expected change from the day's price to it. Tickers
+    without a model are left out and never trade.
+    """
+
+    def __init__(self, forecasts, train_end, bb_window=20, bb_width=2,
+                 rsi_period=14, rsi_oversold=30, rsi_overbought=70):
+        self.forecasts = forecasts
+        self.train_end = train_end
+        self.bb_window = bb_window
+        self.bb_width = bb_width
+        self.rsi_period = rsi_period
+        self.rsi_oversold = rsi_oversold
+        self.rsi_overbought = rsi_overbought
+
+    def compute(self, matrix):
+        n = len(matrix.tickers)
+        eligible = np.zeros(n, dtype=bool)
+        forecasts = np.full(matrix.prices.shape, np.nan)
+        bb_lower = np.full(n, np.nan)
+        bb_upper = np.full(n, np.nan)
+        has_bb = np.zeros(n, dtype=bool)
+        rsi_votes = np.zeros(n, dtype=int)
+
+        for j, ticker in enumerate(matrix.tickers):
+            hist_data = pd.Series(matrix.history(self.train_end - 1, j))
+            if len(hist_data) <= 50 or ticker not in self.forecasts:
+                continue
+            eligible[j] = True
+
+            # 1. ARIMA forecast (vote depends on the day's price, applied below)
+            forecasts[:, j] = self.forecasts[ticker]
+
+            # 2. Bollinger Bands
+            if len(hist_data) >= self.bb_window:
+                prices = hist_data.tail(self.bb_window)
+                bb_mean = prices.mean()
+                bb_std = prices.std()
+                bb_upper[j] = bb_mean + (self.bb_width * bb_std)
+                bb_lower[j] = bb_mean - (self.bb_width * bb_std)
+                has_bb[j] = True
+
+            # 3. RSI
+            if len(hist_data) >= self.rsi_period:
+                price_changes = hist_data.pct_change().tail(self.rsi_period)
+                gains = price_changes[price_changes > 0]
+                losses = -price_changes[price_changes < 0]
+
+                avg_gain = gains.mean() if len(gains) > 0 else 0
+                avg_loss = losses.mean() if len(losses) > 0 else 0
+
+                if avg_loss > 0:
+                    rs = avg_gain / avg_loss
+                    rsi = 100 - (100 / (1 + rs))
+                    if rsi < self.rsi_oversold:
+                        rsi_votes[j] = 1
+                    elif rsi > self.rsi_overbought:
+                        rsi_votes[j] = -1
+
+        # Each indicator votes +1/-1/0; majority voting is the sign of the sum
+        prices = matrix.prices
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change_pct = (forecasts - prices) / prices
+        votes = np.where(change_pct > 0.0001, 1, np.where(change_pct < -0.0001, -1, 0))
+        votes += np.where(has_bb & (prices <= bb_lower), 1,
+                          np.where(has_bb & (prices >= bb_upper), -1, 0))
+        votes += rsi_votes
+        return np.sign(votes) * eligible * matrix.present
+
+
+class LSTMPredictionSignal(ArraySignal):
+    """Relative gap between yesterday's LSTM prediction and today's price.
+
+    `pred_results` maps ticker -> DataFrame of date/predicted_price rows (or
+    None). The prediction made for a ticker's previous prediction row is
+    aligned onto each later prediction date once, so looking a bar up is
+    plain array indexing; bars without a previous prediction are 0.
+    """
+
+    def __init__(self, pred_results):
+        self.pred_results = pred_results
+
+    def compute(self, matrix):
+        values = np.zeros(matrix.prices.shape)
+        for j, ticker in enumerate(matrix.tickers):
+            pred_df = self.pred_results.get(ticker)
+            if pred_df is None or len(pred_df) < 2:
+                continue
+            rows = matrix.dates.get_indexer(pd.DatetimeIndex(pred_df["date"]))
+            pred_yesterday = pred_df["predicted_price"].to_numpy()[:-1]
+            rows = rows[1:]
+            known = rows >= 0
+            price = matrix.prices[rows[known], j]
+            values[rows[known], j] = (pred_yesterday[known] - price) / price
+        return values
+
+
+class MA5TrendSignal(ArraySignal):
+    """True when the 5-day moving average is rising (or there is too little history).
+
+    Averages run over each ticker's own bars, skipping missing ones.
+    """
+
+    def __init__(self, window=5):
+        self.window = window
+
+    def compute(self, matrix):
+        w = self.window
+        values = np.ones(matrix.prices.shape, dtype=bool)
+        for j in range(len(matrix.tickers)):
+            rows = np.flatnonzero(matrix.present[:, j])
+            if len(rows) <= w:
+                continue
+            ma = sliding_window_view(matrix.prices[rows, j], w).mean(axis=1)
+            # Bar k (k >= w) compares the average ending at k with the one ending at k - 1
+            values[rows[w:], j] = ma[1:] > ma[:-1]
+        return values
+
+
+# ---------------------------------------------------------------------------
+# Portfolio bookkeeping and position rules
+# ---------------------------------------------------------------------------
+
+class Portfolio:
+    """Cash and share positions for one backtest run"""
+
+    def __init__(self, matrix, capital):
+        self.matrix = matrix
+        self.capital = capital
+        self.shares = {}        # ticker -> shares, in order of first purchase
+        self.entry_prices = {}  # ticker -> average entry price
+        self.held = np.zeros(len(matrix.tickers))
+        self.trade_count = 0
+
+    def position(self, ticker):
+        return self.shares.get(ticker, 0)
+
+    def buy(self, j, shares, price, count_trade=True):
+        ticker = self.matrix.tickers[j]
+        owned = self.shares.get(ticker, 0)
+        self.capital -= shares * price
+        if owned > 0:
+            old_entry = self.entry_prices[ticker]
+            self.entry_prices[ticker] = (owned * old_entry + shares * price) / (owned + shares)
+        else:
+            self.entry_prices[ticker] = price
+        self.shares[ticker] = owned + shares
+        self.held[j] = owned + shares
+        if count_trade:
+            self.trade_count += 1
+
+    def sell(self, j, shares, price):
+        ticker = self.matrix.tickers[j]
+        self.capital += shares * price
+        self.shares[ticker] -= shares
+        self.held[j] = self.shares[ticker]
+        self.trade_count += 1
+
+    def open_positions(self):
+        """Number of tickers currently held"""
+        return int(np.count_nonzero(self.held))
+
+    def value(self, t):
+        """Cash plus holdings marked at row t (tickers without a bar count as 0)"""
+        marked = self.matrix.present[t] & (self.held != 0)
+        return self.capital + self.held @ np.where(marked, self.matrix.prices[t], 0)
+
+
+class RotationRule:
+    """ARIMA strategy sizing.
+
+    Buys 3% of cash per ticker on the first day, then 10% of cash on every
+    BUY vote (selling the weakest holding first when cash runs low) and half
+    the position on every SELL vote.
+    """
+
+    def __init__(self, allocation=0.1, initial_allocation=0.03, signal='vote', verbose=True):
+        self.allocation = allocation
+        self.initial_allocation = initial_allocation
+        self.signal = signal
+        self.verbose = verbose
+
+    def open(self, portfolio, t, signals):
+        matrix = portfolio.matrix
+        for j in np.flatnonzero(matrix.present[t]):
+            ticker = matrix.tickers[j]
+            price = matrix.prices[t, j]
+            shares = int(portfolio.capital * self.initial_allocation / price)
+            if shares > 0 and portfolio.capital > shares * price:
+                portfolio.buy(j, shares, price, count_trade=False)
+                if self.verbose:
+                    print(f"Initial BUY {shares} shares of {ticker} at ${price:.2f}")
+
+        if self.verbose:
+            print(f"Remaining cash after initial purchases: ${portfolio.capital:,.2f}")
+
+    def on_bar(self, portfolio, t, j, price, signals):
+        signal = signals[self.signal].at(t, j)
+        if signal == 0:
+            return
+
+        matrix = portfolio.matrix
+        ticker = matrix.tickers[j]
+
+        if signal > 0:
+            # If no cash, sell worst performing stock to buy this one
+            if portfolio.capital < price * 10:
+                # Only tickers already priced earlier in the day are candidates
+                day_prices = matrix.prices[t]
+                day_present = matrix.present[t]
+                worst_ticker = None
+                worst_return = float('inf')
+                for held_ticker, shares in portfolio.shares.items():
+                    if shares > 0 and held_ticker != ticker:
+                        col = matrix.ticker_index[held_ticker]
+                        if col < j and day_present[col] and day_prices[col] > 0:
+                            perf = day_prices[col] / price  # Rough performance
+                            if perf < worst_return:
+                                worst_return = perf
+                                worst_ticker = held_ticker
+
+                # Sell worst performer
+                if worst_ticker:
+                    col = matrix.ticker_index[worst_ticker]
+                    sell_shares = portfolio.position(worst_ticker)
+                    sell_price = day_prices[col]
+                    portfolio.sell(col, sell_shares, sell_price)
+                    if self.verbose:
+                        print(f"SELL {sell_shares} shares of {worst_ticker} at ${sell_price:.2f} (to buy {ticker})")
+
+            # Now buy the target stock
+            if portfolio.capital > price * 10:
+                shares = int(portfolio.capital * self.allocation / price)
+                if shares > 0:
+                    portfolio.buy(j, shares, price)
+                    if self.verbose:
+                        print(f"BUY {shares} shares of {ticker} at ${price:.2f}")
+
+        elif portfolio.position(ticker) > 0:
+            # Sell half the position
+            shares = portfolio.position(ticker) // 2
+            if shares > 0:
+                portfolio.sell(j, shares, price)
+                if self.verbose:
+                    print(f"SELL {shares} shares of {ticker} at ${price:.2f}")
+
+
+class TieredRiskRule:
+    """LSTM strategy sizing.
+
+    Invests a larger share of cash the stronger the predicted gain (only in
+    a rising MA5 trend), and exits fully on a predicted drop or stop-loss,
+    or sells half on take-profit.
+    """
+
+    def __init__(self, tiers=((0.05, 0.4), (0.03, 0.3), (0.01, 0.15)),
+                 exit_change=-0.02, take_profit=0.2, stop_loss=-0.07,
+                 signal='prediction', trend='trend', verbose=True):
+        self.tiers = tiers
+        self.exit_change = exit_change
+        self.take_profit = take_profit
+        self.stop_loss = stop_loss
+        self.signal = signal
+        self.trend = trend
+        self.verbose = verbose
+
+    def open(self, portfolio, t, signals):
+        pass
+
+    def on_bar(self, portfolio, t, j, price, signals):
+        matrix = portfolio.matrix
+        ticker = matrix.tickers[j]
+        date = matrix.dates[t]
+        avg_future_change = signals[self.signal].at(t, j)
+
+        # Buy logic
+        if avg_future_change > self.tiers[-1][0] and portfolio.capital > price * 10 \
+                and signals[self.trend].at(t, j):
+            invest_ratio = next(ratio for threshold, ratio in self.tiers
+                                if avg_future_change > threshold)
+            invest_amount = portfolio.capital * invest_ratio
+            shares = int(invest_amount // price)
+            if shares > 0:
+                portfolio.buy(j, shares, price)
+                if self.verbose:
+                    print(f"{date.date()} BUY {shares} {ticker} at {price:.2f}")
+
+        # Sell logic
+        shares = portfolio.position(ticker)
+        if shares > 0:
+            entry_price = portfolio.entry_prices[ticker]
+            profit_pct = (price - entry_price) / entry_price
+
+            if avg_future_change < self.exit_change:
+                # Strong drop signal → full sell
+                portfolio.sell(j, shares, price)
+                if self.verbose:
+                    print(f"{date.date()} FULL SELL {shares} {ticker} at {price:.2f}")
+            elif profit_pct > self.take_profit:
+                sell_shares = shares // 2
+                portfolio.sell(j, sell_shares, price)
+                if self.verbose:
+                    print(f"{date.date()} PARTIAL SELL {sell_shares} {ticker} at {price:.2f} | Profit: {profit_pct:.2%}")
+            elif profit_pct < self.stop_loss:
+                portfolio.sell(j, shares, price)
+                if self.verbose:
+                    print(f"{date.date()} STOP LOSS {shares} {ticker} at {price:.2f} | Loss: {profit_pct:.2%}")
+
+
+# ---------------------------------------------------------------------------
+# Engine, metrics and plots
+# ---------------------------------------------------------------------------
+
+class BacktestResult:
+    """Daily portfolio values and final state of a backtest run"""
+
+    def __init__(self, dates, values, portfolio, initial_capital):
+        self.dates = dates
+        self.values = values
+        self.portfolio = portfolio
+        self.initial_capital = initial_capital
+
+
+def run_backtest(matrix, start, signals, rule, initial_capital=100000, progress_every=None):
+    """Run `rule` over the date rows from `start` onwards.
+
+    `signals` maps names to SignalProvider instances; every provider is
+    prepared on the full matrix (so it can see the training history) and the
+    rule looks up whichever signals it needs for each bar.
+    """
+    for provider in signals.values():
+        provider.prepare(matrix)
+
+    portfolio = Portfolio(matrix, initial_capital)
+    rule.open(portfolio, start, signals)
+
+    total_dates = len(matrix.dates) - start
+    portfolio_values = []
+    for t in range(start, len(matrix.dates)):
+        i = t - start
+        if progress_every and i % progress_every == 0:
+            progress = (i / total_dates) * 100
+            print(f"Progress: {progress:.1f}% ({i}/{total_dates} days)")
+
+        row = matrix.prices[t]
+        for j in np.flatnonzero(matrix.present[t]):
+            rule.on_bar(portfolio, t, j, row[j], signals)
+
+        portfolio_values.append(portfolio.value(t))
+
+    return BacktestResult(list(matrix.dates[start:]), portfolio_values, portfolio, initial_capital)
+
+
+def compute_metrics(result):
+    """Return (metrics dict, per-day DataFrame with returns and drawdown)"""
+    initial_value = result.initial_capital
+    final_value = result.values[-1]
+
+    portfolio_df = pd.DataFrame({'date': result.dates, 'value': result.values})
+    portfolio_df['daily_return'] = portfolio_df['value'].pct_change()
+
+    days = len(result.dates)
+    risk_free_rate = 0.02 / 252
+    excess_returns = portfolio_df['daily_return'].dropna() - risk_free_rate
+
+    portfolio_df['cummax'] = portfolio_df['value'].cummax()
+    portfolio_df['drawdown'] = (portfolio_df['value'] - portfolio_df['cummax']) / portfolio_df['cummax']
+
+    metrics = {
+        'initial_value': initial_value,
+        'final_value': final_value,
+        'total_return': (final_value / initial_value - 1) * 100,
+        'annualized_return': ((final_value / initial_value) ** (365/days) - 1) * 100,
+        'sharpe_ratio': excess_returns.mean() / excess_returns.std() * np.sqrt(252),
+        'max_drawdown': portfolio_df['drawdown'].min() * 100,
+        'volatility': portfolio_df['daily_return'].std() * np.sqrt(252) * 100,
+        'days': days,
+    }
+    return metrics, portfolio_df
+
+
+def print_results(title, indicators, metrics, trades):
+    print(f"\n{'='*50}")
+    print(title)
+    print(f"Indicators: {indicators}")
+    print(f"{'='*50}")
+    print(f"Initial Capital: ${metrics['initial_value']:,.2f}")
+    print(f"Final Portfolio Value: ${metrics['final_value']:,.2f}")
+    print(f"Total Return: {metrics['total_return']:.2f}%")
+    print(f"Annualized Return: {metrics['annualized_return']:.2f}%")
+    print(f"Sharpe Ratio: {metrics['sharpe_ratio']:.2f}")
+    print(f"Max Drawdown: {metrics['max_drawdown']:.2f}%")
+    print(f"Volatility: {metrics['volatility']:.2f}%")
+    print(f"Estimated Trades: {trades}")
+    print(f"Trading Days: {metrics['days']}")
+
+
+def plot_performance(portfolio_df, initial_value, path):
+    """Save the portfolio value / drawdown chart to `path`"""
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
+
+    # Portfolio value over time
+    ax1.plot(portfolio_df['date'], portfolio_df['value'], 'b-', linewidth=2)
+    ax1.axhline(y=initial_value, color='r', linestyle='--', alpha=0.7, label='Initial Value')
+    ax1.set_title('Portfolio Value Over Time')
+    ax1.set_ylabel('Portfolio Value ($)')
+    ax1.legend()
+    ax1.grid(True, alpha=0.3)
+
+    # Drawdown chart
+    ax2.fill_between(portfolio_df['date'], portfolio_df['drawdown'] * 100, 0,
+                     color='red', alpha=0.3, label='Drawdown')
+    ax2.set_title('Portfolio Drawdown')
+    ax2.set_xlabel('Date')
+    ax2.set_ylabel('Drawdown (%)')
+    ax2.legend()
+    ax2.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches='tight')
+    plt.show()
@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from price_store import open_matrix_cache
+from algorithms.model_registry import lstm_registry
+from algorithms.lstm.windowing import sliding_windows, pooled_window_dataset
+from algorithms.lstm.inference import load_scaler, predict_in_batches
+
+GLOBAL_MODEL_PATH = "../../data/lstm/models/lstm_global.keras"
+GLOBAL_SCALERS_PATH = "../../data/lstm/models/lstm_global_scalers.npz"
+GLOBAL_INFO_PATH = "../../data/lstm/lstm_global_model_info.csv"
+PARITY_REPORT_PATH = "../../data/lstm/global_parity_report.csv"
+
+
+def build_global_lstm(n_tickers, time_step=60, embedding_dim=8):
+    """Same LSTM stack as build_lstm, with a learned ticker embedding joined before the output layer"""
+    from tensorflow.keras.models import Model
+    from tensorflow.keras.layers import LSTM, Dense, Dropout, Input, Embedding, Concatenate
+
+    window = Input(shape=(time_step, 1), name="window")
+    ticker = Input(shape=(), dtype="int32", name="ticker")
+    x = LSTM(50, return_sequences=True)(window)
+    x = Dropout(0.2)(x)
+    x = LSTM(50, return_sequences=False)(x)
+    x = Dropout(0.2)(x)
+    x = Concatenate()([x, Embedding(n_tickers, embedding_dim)(ticker)])
+    model = Model(inputs={"window": window, "ticker": ticker}, outputs=Dense(1)(x))
+    model.compile(optimizer="adam", loss="mse")
+    return model
+
+
+class GlobalLSTM:
+    """The shared model plus each ticker's id and min-max scaling"""
+
+    def __init__(self, model, tickers, data_min, data_max):
+        self.model = model
+        self.tickers = list(tickers)
+        self.ticker_index = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.data_min = np.asarray(data_min, dtype=float)
+        # MinMaxScaler maps a constant series to 0 instead of dividing by zero
+        data_range = np.asarray(data_max, dtype=float) - self.data_min
+        self.data_range = np.where(data_range > 0, data_range, 1.0)
+
+    def scale(self, ticker, values):
+        i = self.ticker_index[ticker]
+        return (np.asarray(values, dtype=float) - self.data_min[i]) / self.data_range[i]
+
+    def unscale(self, ticker, values):
+        i = self.ticker_index[ticker]
+        return np.asarray(values, dtype=float) * self.data_range[i] + self.data_min[i]
+
+    def predict(self, ticker, closes, time_step=60, batch_size=4096):
+        """(predicted, true) prices for every window of `closes`"""
+        X, y = sliding_windows(self.scale(ticker, closes), time_step)
+        y_pred = predict_in_batches(self.model, X, batch_size, ticker_id=self.ticker_index[ticker])
+        return self.unscale(ticker, y_pred), self.unscale(ticker, y)
+
+
+def load_global_lstm(model_path=GLOBAL_MODEL_PATH, scalers_path=GLOBAL_SCALERS_PATH):
+    from tensorflow.keras.models import load_model
+
+    with np.load(scalers_path, allow_pickle=False) as scalers:
+        return GlobalLSTM(load_model(model_path), scalers["tickers"],
+                          scalers["data_min"], scalers["data_max"])
+
+
+def train_global_lstm(cache=None, time_step=60, epochs=20, batch_size=256, embedding_dim=8):
+    """Train one LSTM over every ticker's windows.
+
+    Each ticker is min-max scaled on its own training prices and gets
+    an id fed to a ticker embedding. Training windows (the first 80% of
+    each ticker's) are streamed through tf.data, shuffled across tickers.
+    """
+    cache = cache or open_matrix_cache()
+    tickers = [t for t in cache.tickers if len(cache.series(t, "close_price")[1]) > time_step]
+
+    closes_list, bounds, model_info = [], [], []
+    for ticker in tickers:
+        _, closes = cache.series(ticker, "close_price")
+        closes_list.append(closes)
+        n_windows = len(closes) - time_step
+        train_size = int(n_windows * 0.8)
+        bounds.append((0, train_size))
+        model_info.append({
+            "ticker": ticker,
+            "train_size": train_size,
+            "test_size": n_windows - train_size,
+            "model_path": GLOBAL_MODEL_PATH
+        })
+    # Scale each ticker by its training prices only, as train_lstm does
+    data_min = [closes[:stop + time_step].min() for closes, (_, stop) in zip(closes_list, bounds)]
+    data_max = [closes[:stop + time_step].max() for closes, (_, stop) in zip(closes_list, bounds)]
+    scaling = GlobalLSTM(None, tickers, data_min, data_max)
+    series = [scaling.scale(ticker, closes) for ticker, closes in zip(tickers, closes_list)]
+
+    print(f"Training global LSTM over {len(tickers)} tickers, "
+          f"{sum(info['train_size'] for info in model_info)} windows...")
+    start = time.perf_counter()
+    model = build_global_lstm(len(tickers), time_step, embedding_dim)
+    train_data = pooled_window_dataset(series, time_step, batch_size, bounds, shuffle=True)
+    model.fit(train_data, epochs=epochs, verbose=0)
+    print(f"Trained in {time.perf_counter() - start:.1f}s")
+    scaling.model = model
+
+    os.makedirs(os.path.dirname(GLOBAL_MODEL_PATH), exist_ok=True)
+    model.save(GLOBAL_MODEL_PATH)
+    np.savez(GLOBAL_SCALERS_PATH, tickers=np.array(tickers),
+             data_min=np.array(data_min), data_max=np.array(data_max))
+    pd.DataFrame(model_info).to_csv(GLOBAL_INFO_PATH, index=False)
+    return scaling
+
+
+def parity_report(cache=None, global_model=None, time_step=60, batch_size=4096,
+                  info_path="../../data/lstm/lstm_trained_models_info.csv"):
+    """Compare the global model with the per-ticker models on each ticker's test windows.
+
+    Errors are in price units over the last 20% of windows (the windows
+    neither model trained on). Writes PARITY_REPORT_PATH and returns it as
+    a frame.
+    """
+    cache = cache or open_matrix_cache()
+    global_model = global_model or load_global_lstm()
+    info = pd.read_csv(info_path).dropna(subset=["model_path"])
+    info_by_ticker = dict(zip(info["ticker"], info["model_path"]))
+    models = lstm_registry(info_by_ticker, max_models=1)
+
+    rows = []
+    for ticker in info["ticker"]:
+        if ticker not in global_model.ticker_index:
+            continue
+        try:
+            _, closes = cache.series(ticker, "close_price")
+            global_pred, true = global_model.predict(ticker, closes, time_step, batch_size)
+
+            scaler = load_scaler(info_by_ticker[ticker], closes, time_step, ticker)
+            X, _ = sliding_windows(scaler.transform(closes), time_step)
+            ticker_pred = scaler.inverse_transform(predict_in_batches(models[ticker], X, batch_size))
+        except Exception as e:
+            print(f"✗ {ticker}: Evaluation error - {e}")
+            continue
+
+        test = slice(int(len(true) * 0.8), None)
+        ticker_err = ticker_pred[test] - true[test]
+        global_err = global_pred[test] - true[test]
+        rows.append({
+            "ticker": ticker,
+            "test_size": len(true[test]),
+            "per_ticker_rmse": np.sqrt(np.mean(ticker_err ** 2)),
+            "global_rmse": np.sqrt(np.mean(global_err ** 2)),
+            "per_ticker_mae": np.mean(np.abs(ticker_err)),
+            "global_mae": np.mean(np.abs(global_err)),
+        })
+
+    report = pd.DataFrame(rows)
+    if report.empty:
+        print("No tickers to compare")
+        return report
+    report["rmse_ratio"] = report["global_rmse"] / report["per_ticker_rmse"]
+    report.to_csv(PARITY_REPORT_PATH, index=False)
+
+    per_ticker_bytes = sum(os.path.getsize(p) for p in info["model_path"] if os.path.exists(p))
+    global_bytes = os.path.getsize(GLOBAL_MODEL_PATH) if os.path.exists(GLOBAL_MODEL_PATH) else 0
+    print("\nGLOBAL vs PER-TICKER LSTM")
+    print("=" * 50)
+    print(f"Tickers compared:         {len(report)}")
+    print(f"Median RMSE ratio:        {report['rmse_ratio'].median():.3f} (global / per-ticker)")
+    print(f"Global better on:         {(report['rmse_ratio'] < 1).sum()} tickers")
+    print(f"Mean RMSE:                {report['global_rmse'].mean():.2f} global, "
+          f"{report['per_ticker_rmse'].mean():.2f} per-ticker")
+    print(f"Model files:              1 ({global_bytes / 1e6:.1f} MB) vs "
+          f"{len(info)} ({per_ticker_bytes / 1e6:.1f} MB)")
+    print(f"Report written to {PARITY_REPORT_PATH}")
+    return report
+
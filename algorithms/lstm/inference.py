@@ -0,0 +1,255 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+PREDICTIONS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                               '..', '..', 'data', 'lstm', 'predictions'))
+
+
+def configure_threads(intra_op=None, inter_op=None, cpu_only=True):
+    """Set TensorFlow CPU thread pools; must run before TensorFlow executes anything"""
+    import tensorflow as tf
+
+    if cpu_only:
+        tf.config.set_visible_devices([], 'GPU')
+    if intra_op:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+    if inter_op:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+
+
+def file_hash(path):
+    """sha256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def data_version(dates, values):
+    """Fingerprint of one ticker's input series"""
+    digest = hashlib.sha256()
+    digest.update(np.asarray(dates, dtype='datetime64[ns]').view('int64').tobytes())
+    digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def padded_size(n, batch_size, step=256):
+    """n rounded up to a multiple of `step`, capped at batch_size"""
+    return min(-(-n // step) * step, batch_size)
+
+
+def predict_in_batches(model, X, batch_size=4096, ticker_id=None):
+    """model outputs for X, run in batches of at most `batch_size` windows.
+
+    Each batch is zero-padded to the next multiple of 256 rows (see
+    padded_size), so the predict function is traced at most once per size
+    bucket while a ticker's ~2,500 windows run as 2,560 rows instead of a
+    full batch. With `ticker_id`, inputs are fed as {'window', 'ticker'}
+    for the global model.
+    """
+    out = np.empty(len(X), dtype=np.float32)
+    batch = np.zeros((batch_size,) + X.shape[1:], dtype=np.float32)
+    for start in range(0, len(X), batch_size):
+        n = min(batch_size, len(X) - start)
+        size = padded_size(n, batch_size)
+        batch[:n] = X[start:start + n]
+        batch[n:size] = 0
+        inputs = batch[:size] if ticker_id is None else {
+            'window': batch[:size], 'ticker': np.full(size, ticker_id, dtype=np.int32)}
+        out[start:start + n] = np.asarray(model.predict_on_batch(inputs)).reshape(-1)[:n]
+    return out
+
+
+def scaler_path(model_path):
+    """Where the scaler of the model saved at `model_path` is kept"""
+    return os.path.splitext(model_path)[0] + '_scaler.npz'
+
+
+def load_scaler(model_path, closes, time_step, ticker=None):
+    """The scaler saved with the model at `model_path`.
+
+    Models saved without one (trained before scalers were saved) were
+    trained on prices scaled over the whole series, so they are given the
+    same scaling, with a warning: their test prices leak into it, and they
+    should be retrained with lstm_train.py.
+    """
+    path = scaler_path(model_path)
+    if os.path.exists(path):
+        return SeriesScaler.load(path)
+    print(f"⚠ {ticker or model_path}: no saved scaler, scaling over the full series as the "
+          f"model was trained (retrain with lstm_train.py for leak-free scaling)")
+    return SeriesScaler.fit(closes, time_step)
+
+
+class SeriesScaler:
+    """Min-max scaling of one price series, fit on a model's training prices only.
+
+    Same arithmetic as sklearn's MinMaxScaler(feature_range=(0, 1)); saved
+    next to the model with the window length it was trained on, so
+    inference scales prices exactly as training did.
+    """
+
+    def __init__(self, data_min, data_max, time_step):
+        self.data_min = float(data_min)
+        self.data_max = float(data_max)
+        self.time_step = int(time_step)
+        data_range = self.data_max - self.data_min
+        self.scale = 1.0 / data_range if data_range > 0 else 1.0
+        self.min = -self.data_min * self.scale
+
+    @classmethod
+    def fit(cls, values, time_step):
+        values = np.asarray(values, dtype=float)
+        return cls(values.min(), values.max(), time_step)
+
+    def transform(self, values):
+        return np.asarray(values, dtype=float) * self.scale + self.min
+
+    def inverse_transform(self, values):
+        return (np.asarray(values, dtype=float) - self.min) / self.scale
+
+    def save(self, path):
+        np.savez(path, data_min=self.data_min, data_max=self.data_max, time_step=self.time_step)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['data_min'], data['data_max'], data['time_step'])
+
+
+class WalkForwardLSTM:
+    """Next-day forecasts for one ticker, updated one close at a time.
+
+    Only the last `time_step` closes are kept, in a rolling buffer, so each
+    day costs one push and one single-window predict. The backtest's
+    walk-forward mode and the daily forecast job both run through this
+    class, so simulated and live forecasts are computed the same way.
+    """
+
+    def __init__(self, model, scaler):
+        self.model = model
+        self.scaler = scaler
+        self.time_step = scaler.time_step
+        self.buffer = np.zeros(self.time_step)  # raw closes, oldest first
+        self.count = 0
+        self.last_date = None
+
+    def push(self, close, date=None):
+        """Add the next close to the buffer"""
+        self.buffer[:-1] = self.buffer[1:]
+        self.buffer[-1] = close
+        self.count += 1
+        if date is not None:
+            self.last_date = pd.Timestamp(date)
+
+    def forecast(self):
+        """Forecast of the close after the last one pushed (None until the buffer is full)"""
+        if self.count < self.time_step:
+            return None
+        window = self.scaler.transform(self.buffer).astype(np.float32).reshape(1, self.time_step, 1)
+        pred = np.asarray(self.model.predict_on_batch(window)).reshape(-1)[0]
+        return float(self.scaler.inverse_transform(pred))
+
+    def update(self, close, date=None):
+        """push() then forecast(): the daily step"""
+        self.push(close, date)
+        return self.forecast()
+
+    def save_state(self, path):
+        last_date = np.datetime64('NaT', 'ns') if self.last_date is None else np.datetime64(self.last_date, 'ns')
+        np.savez(path, buffer=self.buffer, count=self.count, last_date=last_date)
+
+    def load_state(self, path):
+        """Restore a saved buffer; False (state unchanged) if it was saved for another time_step"""
+        with np.load(path, allow_pickle=False) as data:
+            if data['buffer'].shape != self.buffer.shape:
+                return False
+            self.buffer[:] = data['buffer']
+            self.count = int(data['count'])
+            last_date = data['last_date'][()]
+        self.last_date = None if np.isnat(last_date) else pd.Timestamp(last_date)
+        return True
+
+
+def walk_forward_predictions(forecaster, dates, closes, start=None):
+    """Prediction frame built one close at a time, as the daily job sees the data.
+
+    Closes before `start` (at least time_step) only fill the buffer; from
+    there on, each bar's prediction is made before its close is pushed.
+    With start=time_step the result equals the batch predictions.
+    """
+    start = max(start or 0, forecaster.time_step)
+    for close in closes[start - forecaster.time_step:start]:
+        forecaster.push(close)
+    predicted = np.empty(max(len(closes) - start, 0))
+    for i in range(start, len(closes)):
+        predicted[i - start] = forecaster.forecast()
+        forecaster.push(closes[i], dates[i])
+    return pd.DataFrame({
+        'date': dates.values[start:],
+        'true_price': np.asarray(closes[start:], dtype=float),
+        'predicted_price': predicted
+    })
+
+
+class PredictionCache:
+    """On-disk cache of per-ticker LSTM predictions.
+
+    Entries are keyed by (model and scaler file hashes, input data version,
+    time_step, mode), so re-running a backtest with different trading
+    thresholds never runs the network again, while retraining a model or
+    regenerating the data invalidates exactly the affected tickers. With read=False every load
+    misses, but results are still saved.
+    """
+
+    def __init__(self, cache_dir=PREDICTIONS_DIR, read=True):
+        self.cache_dir = cache_dir
+        self.read = read
+        self._model_hashes = {}  # path -> (mtime, size, hash)
+        self.hits = 0
+        self.misses = 0
+
+    def model_hash(self, path):
+        stat = os.stat(path)
+        cached = self._model_hashes.get(path)
+        if cached is None or cached[:2] != (stat.st_mtime, stat.st_size):
+            cached = (stat.st_mtime, stat.st_size, file_hash(path))
+            self._model_hashes[path] = cached
+        return cached[2]
+
+    def path(self, ticker, model_path, version, time_step, mode='batch'):
+        """Cache file for one ticker; the model's saved scaler, if any, is part of the key"""
+        files = [model_path] + [p for p in [scaler_path(model_path)] if os.path.exists(p)]
+        hashes = ':'.join(self.model_hash(path) for path in files)
+        if len(files) == 1:
+            hashes += ':full-series-scaler'  # see load_scaler
+        key = hashlib.sha256(f'{hashes}:{version}:{time_step}:{mode}'.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f'{ticker}_{key[:20]}.npz')
+
+    def load(self, path):
+        if not self.read or not os.path.exists(path):
+            self.misses += 1
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            self.hits += 1
+            return pd.DataFrame({
+                'date': pd.DatetimeIndex(data['date']),
+                'true_price': data['true_price'],
+                'predicted_price': data['predicted_price'],
+            })
+
+    def save(self, path, pred_df):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path,
+                 date=pred_df['date'].to_numpy(dtype='datetime64[ns]'),
+                 true_price=pred_df['true_price'].to_numpy(),
+                 predicted_price=pred_df['predicted_price'].to_numpy())
+        os.replace(tmp_path, path)
+
+    def summary(self):
+        return f"Prediction cache: {self.hits} hits, {self.misses} misses ({self.cache_dir})"
@@ -1,209 +1,239 @@
+import argparse
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import os
-from tensorflow.keras.models import load_model
-from sklearn.preprocessing import MinMaxScaler
-
-def run_lstm_backtest(time_step=90):
-    #print("Running LSTM backtest (batch prediction mode)...")
-    # Load data
-    df = pd.read_csv("data/processed_tech_stock_data.csv")
-    df["date"] = pd.to_datetime(df["date"])
-    tickers = df["ticker"].unique()
-    print(f"Processing {len(tickers)} tickers...")
+import sys
+from functools import partial
+from multiprocessing import cpu_count
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from algorithms.backtest import (matrix_from_cache, run_backtest as run_strategy,
+                                 LSTMPredictionSignal, MA5TrendSignal, TieredRiskRule,
+                                 compute_metrics, print_results, plot_performance)
+from algorithms.sweep import run_sweep
+from algorithms.model_registry import lstm_registry
+from price_store import open_matrix_cache
+from algorithms.lstm.windowing import sliding_windows
+from algorithms.lstm.inference import (PredictionCache, WalkForwardLSTM, configure_threads,
+                                       data_version, load_scaler, predict_in_batches,
+                                       walk_forward_predictions)
+
+# Thresholds tried by `sweep` mode (defaults: 0.05/0.03/0.01 invest tiers, +20% take-profit, -7% stop-loss)
+SWEEP_GRID = {
+    "tier_thresholds": [(0.05, 0.03, 0.01), (0.06, 0.04, 0.02), (0.04, 0.02, 0.005)],
+    "take_profit": [0.1, 0.2, 0.3],
+    "stop_loss": [-0.05, -0.07, -0.1],
+    "exit_change": [-0.01, -0.02, -0.03],
+}
+TIER_RATIOS = (0.4, 0.3, 0.15)
+
+# Keras models kept resident at once while precomputing predictions
+MODEL_CACHE_SIZE = 8
+# Most windows per predict call (batches are padded to multiples of 256 rows)
+INFERENCE_BATCH_SIZE = 4096
+# Per-ticker rolling buffers kept between runs of the daily `forecast` job
+STATE_DIR = "../../data/lstm/state"
+
+
+def predict_ticker(model, scaler, dates, closes, batch_size):
+    """Run one ticker's model over every window of its close series"""
+    X, _ = sliding_windows(scaler.transform(closes), scaler.time_step)
+    y_pred = predict_in_batches(model, X, batch_size)
+    return pd.DataFrame({
+        "date": dates.values[scaler.time_step:],
+        "true_price": closes[scaler.time_step:].astype(float),
+        "predicted_price": scaler.inverse_transform(y_pred)
+    })
+
+
+def load_backtest_inputs(time_step=60, batch_size=INFERENCE_BATCH_SIZE,
+                         intra_op_threads=None, inter_op_threads=None, use_cache=True,
+                         walk_forward=False):
+    """Load prices and LSTM predictions; return (matrix, train_size, pred_results)
+
+    Prices are scaled with each model's saved training scaler, and each
+    model sees windows of the length it was trained on (`time_step` is
+    only used for models saved without a scaler, see load_scaler). With walk_forward, the
+    test period is forecast one close at a time through WalkForwardLSTM,
+    exactly as the daily `forecast` job does.
+
+    Predictions are read from the on-disk prediction cache when the model
+    file, the ticker's prices and time_step are unchanged, so only new or
+    retrained models are run (on CPU, in padded batches, see predict_in_batches).
+    """
+    # Load data (memory-mapped dates x tickers matrix)
+    cache = open_matrix_cache()
+    matrix = matrix_from_cache(cache)
+    print(f"Processing {len(matrix.tickers)} tickers...")
 
     # Split
-    all_dates = sorted(df["date"].unique())
-    train_size = int(len(all_dates) * 0.8)
-    dates = all_dates[train_size:]
-    print(f"Backtesting over {len(dates)} trading days...")
+    train_size = int(len(matrix.dates) * 0.8)
+    print(f"Backtesting over {len(matrix.dates) - train_size} trading days...")
 
     # Load model info
     info = pd.read_csv("../../data/lstm/lstm_trained_models_info.csv")
 
+    models = lstm_registry(dict(zip(info["ticker"], info["model_path"])),
+                           max_models=MODEL_CACHE_SIZE)
+    predictions = PredictionCache(read=use_cache)
+    threads_configured = False
+
     # Precompute predictions
     pred_results = {}
     for _, row in info.iterrows():
         ticker = row["ticker"]
-        model_path = row["model_path"]
 
         try:
-            model = load_model(model_path)
-            # Prepare data
-            data = df[df["ticker"] == ticker].copy()
-            data = data[["date", "close_price"]].sort_values("date").reset_index(drop=True)
-            scaler = MinMaxScaler(feature_range=(0, 1))
-            scaled = scaler.fit_transform(data[["close_price"]])
-
-            X, y = [], []
-            for i in range(len(scaled) - time_step):
-                X.append(scaled[i:(i+time_step), 0])
-                y.append(scaled[i + time_step, 0])
-            X = np.array(X).reshape(-1, time_step, 1)
-            y = np.array(y)
-
-            # Predict once
-            y_pred = model.predict(X, verbose=0)
-            y_pred_rescaled = scaler.inverse_transform(y_pred)
-            pred_df = pd.DataFrame({
-                "date": data["date"].values[time_step:],
-                "true_price": scaler.inverse_transform(y.reshape(-1,1)).flatten(),
-                "predicted_price": y_pred_rescaled.flatten()
-            })
+            dates, closes = cache.series(ticker, "close_price")
+            # Walk forward from the bar before the backtest starts (its
+            # prediction is the first one the strategy looks at)
+            start = max(dates.searchsorted(matrix.dates[train_size]) - 1, 0)
+            mode = f"walk-forward:{start}" if walk_forward else "batch"
+            cache_path = predictions.path(ticker, row["model_path"],
+                                          data_version(dates, closes), time_step, mode)
+            pred_df = predictions.load(cache_path)
+            if pred_df is None:
+                if not threads_configured:
+                    configure_threads(intra_op_threads, inter_op_threads)
+                    threads_configured = True
+                scaler = load_scaler(row["model_path"], closes, time_step, ticker)
+                if walk_forward:
+                    forecaster = WalkForwardLSTM(models[ticker], scaler)
+                    pred_df = walk_forward_predictions(forecaster, dates, closes, start)
+                else:
+                    pred_df = predict_ticker(models[ticker], scaler, dates, closes, batch_size)
+                predictions.save(cache_path, pred_df)
             pred_results[ticker] = pred_df
         except Exception as e:
             print(f"✗ {ticker}: Prediction error - {e}")
             pred_results[ticker] = None
+    print(predictions.summary())
+    print(models.summary())
+
+    return matrix, train_size, pred_results
+
+
+def daily_forecasts(state_dir=STATE_DIR, time_step=60):
+    """Advance every ticker's forecaster to its latest close and forecast the next one.
+
+    Each ticker's rolling buffer is saved in `state_dir`, so a daily run
+    only pushes the closes that arrived since the last run (the first run
+    seeds the buffer from the last time_step closes). Forecasts are
+    written to data/lstm/daily_forecasts.csv.
+    """
+    cache = open_matrix_cache()
+    info = pd.read_csv("../../data/lstm/lstm_trained_models_info.csv").dropna(subset=["model_path"])
+    models = lstm_registry(dict(zip(info["ticker"], info["model_path"])),
+                           max_models=MODEL_CACHE_SIZE)
+    os.makedirs(state_dir, exist_ok=True)
+
+    forecasts = []
+    for _, row in info.iterrows():
+        ticker = row["ticker"]
+        try:
+            dates, closes = cache.series(ticker, "close_price")
+            scaler = load_scaler(row["model_path"], closes, time_step, ticker)
+            forecaster = WalkForwardLSTM(models[ticker], scaler)
+            state_path = os.path.join(state_dir, f"{ticker}.npz")
+            if os.path.exists(state_path) and forecaster.load_state(state_path) and forecaster.last_date is not None:
+                start = dates.searchsorted(forecaster.last_date, side="right")
+            else:
+                start = max(len(closes) - forecaster.time_step, 0)
+            for i in range(start, len(closes)):
+                forecaster.push(closes[i], dates[i])
+            forecaster.save_state(state_path)
+
+            forecast = forecaster.forecast()
+            forecasts.append({
+                "ticker": ticker,
+                "last_date": forecaster.last_date,
+                "last_close": forecaster.buffer[-1],
+                "forecast": forecast,
+                "expected_change": None if forecast is None else forecast / forecaster.buffer[-1] - 1,
+                "new_closes": len(closes) - start
+            })
+        except Exception as e:
+            print(f"✗ {ticker}: Forecast error - {e}")
+
+    forecasts = pd.DataFrame(forecasts)
+    forecasts.to_csv("../../data/lstm/daily_forecasts.csv", index=False)
+    print(forecasts.to_string(index=False))
+    print(models.summary())
+    return forecasts
+
+
+def build_strategy(params, pred_results):
+    """Signals and rule for one sweep parameter combination"""
+    signals = {
+        "prediction": LSTMPredictionSignal(pred_results),
+        "trend": MA5TrendSignal(),
+    }
+    rule = TieredRiskRule(tiers=tuple(zip(params["tier_thresholds"], TIER_RATIOS)),
+                          exit_change=params["exit_change"],
+                          take_profit=params["take_profit"],
+                          stop_loss=params["stop_loss"],
+                          verbose=False)
+    return signals, rule
+
+
+def run_lstm_backtest(time_step=60, **inference):
+    matrix, train_size, pred_results = load_backtest_inputs(time_step, **inference)
 
     # Backtest using predictions
-    capital = 100000
-    positions = {}
-    portfolio_values = []
-    trade_count = 0
-
-    for i, date in enumerate(dates):
-        day_data = df[df["date"] == date]
-        current_prices = {}
-        for ticker in tickers:
-            ticker_data = day_data[day_data["ticker"] == ticker]
-            if not ticker_data.empty:
-                price = ticker_data["adj_close_price"].iloc[0]
-                current_prices[ticker] = price
-                pred_df = pred_results.get(ticker)
-                if pred_df is not None and date in list(pred_df["date"]):
-                    row_idx = pred_df.index[pred_df["date"] == date][0]
-                    if row_idx > 0:
-                        pred_yesterday = pred_df.loc[row_idx-1, "predicted_price"]
-                        avg_future_change = (pred_yesterday - price) / price
-                    else:
-                        avg_future_change = 0
-                else:
-                    avg_future_change = 0
-
-                # Trend filter
-                hist_prices = df[(df["ticker"] == ticker) & (df["date"] <= date)]["adj_close_price"]
-                if len(hist_prices) >= 6:
-                    ma5_now = hist_prices.tail(5).mean()
-                    ma5_prev = hist_prices.tail(6).head(5).mean()
-                    ma_trend_up = ma5_now > ma5_prev
-                else:
-                    ma_trend_up = True
-
-                # Buy logic
-                if avg_future_change > 0.01 and ma_trend_up and capital > price * 10:
-                    if avg_future_change > 0.05:  
-                        invest_ratio = 0.4   # very strong signal
-                    elif avg_future_change > 0.03:
-                        invest_ratio = 0.3   # strong signal
-                    else:
-                        invest_ratio = 0.15  # normal signal
-
-                    invest_amount = capital * invest_ratio
-                    shares = int(invest_amount // price)
-
-                    if shares > 0:
-                        capital -= shares * price
-
-                        if ticker in positions:
-
-                            old_shares = positions[ticker]["shares"]
-                            old_entry = positions[ticker]["entry_price"]
-                            new_total_shares = old_shares + shares
-                            new_entry_price = (old_shares * old_entry + shares * price) / new_total_shares
-                            positions[ticker] = {"shares": new_total_shares, "entry_price": new_entry_price}
-                        else:
-                            positions[ticker] = {"shares": shares, "entry_price": price}
-                            
-                        trade_count += 1
-                        print(f"{date.date()} BUY {shares} {ticker} at {price:.2f}")
-
-                # Sell logic
-                if ticker in positions and positions[ticker]["shares"] > 0:
-                    entry_price = positions[ticker]["entry_price"]
-                    shares = positions[ticker]["shares"]
-                    profit_pct = (price - entry_price) / entry_price
-
-                    if avg_future_change < -0.02:  
-                        # Strong drop signal → full sell
-                        capital += shares * price
-                        positions.pop(ticker)
-                        trade_count += 1
-                        print(f"{date.date()} FULL SELL {shares} {ticker} at {price:.2f}")
-                    elif profit_pct > 0.2:  
-                        # Take profit at +20%
-                        sell_shares = shares // 2
-                        capital += sell_shares * price
-                        positions[ticker]["shares"] -= sell_shares
-                        if positions[ticker]["shares"] == 0:
-                            positions.pop(ticker)
-                        trade_count += 1
-                        print(f"{date.date()} PARTIAL SELL {sell_shares} {ticker} at {price:.2f} | Profit: {profit_pct:.2%}")
-                    elif profit_pct < -0.07:  
-                        # Stop loss at -7%
-                        capital += shares * price
-                        positions.pop(ticker)
-                        trade_count += 1
-                        print(f"{date.date()} STOP LOSS {shares} {ticker} at {price:.2f} | Loss: {profit_pct:.2%}")
-
-        # Portfolio value
-        stock_value = sum(positions[t]["shares"] * current_prices.get(t, 0) for t in positions)
-        portfolio_value = capital + stock_value
-        portfolio_values.append(portfolio_value)
+    signals = {
+        "prediction": LSTMPredictionSignal(pred_results),
+        "trend": MA5TrendSignal(),
+    }
+    result = run_strategy(matrix, train_size, signals, TieredRiskRule())
 
     # Evaluate results
-    initial_value = 100000
-    final_value = portfolio_values[-1]
-    portfolio_df = pd.DataFrame({"date": dates, "value": portfolio_values})
-    portfolio_df["daily_return"] = portfolio_df["value"].pct_change()
-
-    total_return = (final_value / initial_value - 1) * 100
-    days = len(dates)
-    annualized_return = ((final_value / initial_value) ** (365/days) - 1) * 100
-    risk_free_rate = 0.02 / 252
-    excess_returns = portfolio_df["daily_return"].dropna() - risk_free_rate
-    sharpe_ratio = excess_returns.mean() / excess_returns.std() * np.sqrt(252)
-    portfolio_df["cummax"] = portfolio_df["value"].cummax()
-    portfolio_df["drawdown"] = (portfolio_df["value"] - portfolio_df["cummax"]) / portfolio_df["cummax"]
-    max_drawdown = portfolio_df["drawdown"].min() * 100
-    volatility = portfolio_df["daily_return"].std() * np.sqrt(252) * 100
-
-    print("\n" + "="*50)
-    print("LSTM STRATEGY RESULTS")
-    print("Indicators: Precomputed LSTM + MA5 + Stop Loss/Take Profit")
-    print("="*50)
-    print(f"Initial Capital: ${initial_value:,.2f}")
-    print(f"Final Portfolio Value: ${final_value:,.2f}")
-    print(f"Total Return: {total_return:.2f}%")
-    print(f"Annualized Return: {annualized_return:.2f}%")
-    print(f"Sharpe Ratio: {sharpe_ratio:.2f}")
-    print(f"Max Drawdown: {max_drawdown:.2f}%")
-    print(f"Volatility: {volatility:.2f}%")
-    print(f"Estimated Trades: {trade_count}")
-    print(f"Trading Days: {days}")
-
-    # Plot
-    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
-    ax1.plot(portfolio_df["date"], portfolio_df["value"], "b-", linewidth=2)
-    ax1.axhline(y=initial_value, color="r", linestyle="--", alpha=0.7, label="Initial Value")
-    ax1.set_title("Portfolio Value Over Time")
-    ax1.set_ylabel("Portfolio Value ($)")
-    ax1.legend()
-    ax1.grid(True, alpha=0.3)
-
-    ax2.fill_between(portfolio_df["date"], portfolio_df["drawdown"] * 100, 0,
-                     color="red", alpha=0.3, label="Drawdown")
-    ax2.set_title("Portfolio Drawdown")
-    ax2.set_xlabel("Date")
-    ax2.set_ylabel("Drawdown (%)")
-    ax2.legend()
-    ax2.grid(True, alpha=0.3)
-
-    plt.tight_layout()
-    plt.savefig("../../data/lstm_portfolio_performance.png", dpi=300, bbox_inches="tight")
-    plt.show()
-
-    return final_value, total_return
+    metrics, portfolio_df = compute_metrics(result)
+    print_results("LSTM STRATEGY RESULTS",
+                  "Precomputed LSTM + MA5 + Stop Loss/Take Profit",
+                  metrics, result.portfolio.trade_count)
+
+    plot_performance(portfolio_df, result.initial_capital,
+                     "../../data/plots/lstm_portfolio_performance.png")
+
+    return metrics["final_value"], metrics["total_return"]
+
+
+def run_parameter_sweep(workers=None, time_step=60, **inference):
+    """Backtest every SWEEP_GRID combination in parallel over one set of predictions"""
+    matrix, train_size, pred_results = load_backtest_inputs(time_step, **inference)
+
+    build = partial(build_strategy, pred_results=pred_results)
+    results = run_sweep(matrix, train_size, build, SWEEP_GRID, workers=workers,
+                        output_path="../../data/lstm/sweep_results.csv")
+
+    print("\nTop 10 parameter combinations:")
+    print(results.head(10).to_string(index=False))
+    return results
 
 if __name__ == "__main__":
-    run_lstm_backtest()
+    parser = argparse.ArgumentParser(description="Backtest the per-ticker LSTM strategy")
+    parser.add_argument("mode", nargs="?", choices=["backtest", "sweep", "forecast"], default="backtest",
+                        help="forecast: update the daily walk-forward state and forecast the next close")
+    parser.add_argument("workers", nargs="?", type=int, default=cpu_count(),
+                        help="sweep worker processes")
+    parser.add_argument("--batch-size", type=int, default=INFERENCE_BATCH_SIZE,
+                        help="windows per predict call")
+    parser.add_argument("--intra-op-threads", type=int, help="TensorFlow intra-op threads")
+    parser.add_argument("--inter-op-threads", type=int, help="TensorFlow inter-op threads")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="recompute predictions even if cached")
+    parser.add_argument("--walk-forward", action="store_true",
+                        help="forecast the test period one close at a time, as the daily job does")
+    args = parser.parse_args()
+
+    inference = dict(batch_size=args.batch_size,
+                     intra_op_threads=args.intra_op_threads,
+                     inter_op_threads=args.inter_op_threads,
+                     use_cache=not args.no_cache,
+                     walk_forward=args.walk_forward)
+    if args.mode == "forecast":
+        daily_forecasts()
+    elif args.mode == "sweep":
+        run_parameter_sweep(args.workers, **inference)
+    else:
+        run_lstm_backtest(**inference)
@@ -1,17 +1,17 @@
+import argparse
 import os
+import sys
+import time
+from multiprocessing import cpu_count, get_context
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Dropout, Input
 
-def create_dataset(series, time_step=60):
-    """Build sliding window dataset"""
-    X, y = [], []
-    for i in range(len(series) - time_step):
-        X.append(series[i:(i + time_step), 0])
-        y.append(series[i + time_step, 0])
-    return np.array(X), np.array(y)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from price_store import open_matrix_cache, data_mtime
+from algorithms.lstm.windowing import sliding_windows, window_dataset
+from algorithms.lstm.inference import SeriesScaler, configure_threads, scaler_path
 
 def build_lstm(time_step=60):
     """Build LSTM model"""
@@ -26,65 +26,178 @@ def build_lstm(time_step=60):
     model.compile(optimizer='adam', loss='mse')
     return model
 
-def train_lstm(data_path="data/processed_tech_stock_data.csv",
-               time_step=60, epochs=20, batch_size=32):
-    
-    # Load data
-    df = pd.read_csv(data_path)
-    df['date'] = pd.to_datetime(df['date'])
-    tickers = df['ticker'].unique()
+# Per-worker state, filled in once by _init_worker
+_worker = {}
 
-    # Create dirs
-    os.makedirs("../../data/lstm/models", exist_ok=True)
+def _init_worker(cache_dir, threads):
+    """Map the matrix cache and cap TensorFlow's CPU threads once per worker process"""
+    from price_store import MatrixCache
 
-    model_info = []
+    # Before TensorFlow runs anything; several workers sharing a GPU would
+    # each try to claim all of its memory, so workers train on CPU
+    configure_threads(intra_op=threads, inter_op=1 if threads else None, cpu_only=True)
+    _worker['cache'] = MatrixCache(cache_dir)
 
-    for ticker in tickers:
-        try:
-            print(f"\n Training LSTM for {ticker}...")
-            
-            # Get data
-            data = df[df['ticker'] == ticker].copy()
-            data = data[['date', 'close_price']].sort_values('date').reset_index(drop=True)
-            scaler = MinMaxScaler(feature_range=(0, 1))
-            scaled = scaler.fit_transform(data[['close_price']])
-
-            X, y = create_dataset(scaled, time_step)
-            X = X.reshape(X.shape[0], X.shape[1], 1)
-
-            # Train/test split
-            train_size = int(len(X) * 0.8)
-            X_train, X_test = X[:train_size], X[train_size:]
-            y_train, y_test = y[:train_size], y[train_size:]
-
-            # Build & train model
-            model = build_lstm(time_step)
+def model_path_for(ticker):
+    return f"../../data/lstm/models/lstm_{ticker}.keras"
+
+def train_ticker(task):
+    """Train and save one ticker's model; return its info row"""
+    ticker, time_step, epochs, batch_size, use_tf_data = task
+    start = time.perf_counter()
+    try:
+        # Get data
+        _, closes = _worker['cache'].series(ticker, 'close_price')
+        train_size = int(max(len(closes) - time_step, 0) * 0.8)
+        # Fit the scaler on the training windows' prices only, so nothing
+        # from the test period leaks into the inputs
+        scaler = SeriesScaler.fit(closes[:train_size + time_step], time_step)
+        scaled = scaler.transform(closes)
+
+        X, y = sliding_windows(scaled, time_step)
+
+        # Train/test split
+        X_train, X_test = X[:train_size], X[train_size:]
+        y_train, y_test = y[:train_size], y[train_size:]
+
+        # Build & train model
+        model = build_lstm(time_step)
+        if use_tf_data:
+            train_data = window_dataset(scaled, time_step, batch_size, stop=train_size, shuffle=True)
+            model.fit(train_data, epochs=epochs, verbose=0)
+        else:
             model.fit(X_train, y_train, epochs=epochs, batch_size=batch_size, verbose=0)
 
-            # Save model only
-            model_path = f"../../data/lstm/models/lstm_{ticker}.keras"
-            model.save(model_path)
+        # Save model and scaler; written under temporary names and renamed,
+        # model last, so an interrupted run never leaves a partial model
+        # that looks up to date
+        model_path = model_path_for(ticker)
+        tmp_path = model_path[:-len(".keras")] + ".tmp.keras"
+        model.save(tmp_path)
+        tmp_scaler = scaler_path(model_path)[:-len(".npz")] + ".tmp.npz"
+        scaler.save(tmp_scaler)
+        os.replace(tmp_scaler, scaler_path(model_path))
+        os.replace(tmp_path, model_path)
 
-            # Save info
-            model_info.append({
-                "ticker": ticker,
-                "train_size": len(X_train),
-                "test_size": len(X_test),
-                "model_path": model_path
-            })
-
-        except Exception as e:
-            print(f"{ticker}: Error - {e}")
-            model_info.append({
+        info = {
+            "ticker": ticker,
+            "train_size": len(X_train),
+            "test_size": len(X_test),
+            "model_path": model_path,
+            "status": "trained"
+        }
+    except Exception as e:
+        print(f"{ticker}: Error - {e}")
+        info = {
+            "ticker": ticker,
+            "train_size": 0,
+            "test_size": 0,
+            "model_path": None,
+            "status": "failed"
+        }
+    info["train_seconds"] = round(time.perf_counter() - start, 3)
+    return info
+
+def is_up_to_date(ticker):
+    """True if the ticker's saved model (with its scaler) is newer than its price data"""
+    model_path = model_path_for(ticker)
+    return (os.path.exists(model_path) and os.path.exists(scaler_path(model_path))
+            and os.path.getmtime(model_path) > data_mtime(ticker))
+
+def train_lstm(cache=None,
+               time_step=60, epochs=20, batch_size=32, use_tf_data=False,
+               workers=1, threads_per_worker=None, force=False):
+    """Train one LSTM per ticker.
+    
+    Windows are zero-copy views of the scaled series; with use_tf_data the
+    training windows are instead streamed to Keras batch by batch through
+    tf.data, so only one batch is ever materialized.
+
+    With workers > 1 tickers are trained in parallel processes, each capped
+    at `threads_per_worker` TensorFlow threads (default: cores / workers).
+    Tickers whose model is newer than their data are skipped unless
+    `force` is set, so an interrupted run picks up where it stopped.
+    """
+    run_start = time.perf_counter()
+    # Load data (memory-mapped dates x tickers matrix)
+    cache = cache or open_matrix_cache()
+    tickers = cache.tickers
+
+    # Create dirs
+    os.makedirs("../../data/lstm/models", exist_ok=True)
+    info_path = "../../data/lstm/lstm_trained_models_info.csv"
+    previous = {}
+    if os.path.exists(info_path):
+        previous = {row["ticker"]: row for row in pd.read_csv(info_path).to_dict("records")}
+
+    model_info = {}
+    pending = []
+    for ticker in tickers:
+        if not force and is_up_to_date(ticker):
+            n_windows = max(len(cache.series(ticker, 'close_price')[1]) - time_step, 0)
+            model_info[ticker] = {
                 "ticker": ticker,
-                "train_size": 0,
-                "test_size": 0,
-                "model_path": None
-            })
+                "train_size": int(n_windows * 0.8),
+                "test_size": n_windows - int(n_windows * 0.8),
+                "model_path": model_path_for(ticker),
+                "status": "skipped",
+                # Keep the time the model took when it was trained
+                "train_seconds": previous.get(ticker, {}).get("train_seconds")
+            }
+        else:
+            pending.append((ticker, time_step, epochs, batch_size, use_tf_data))
+    print(f"Training {len(pending)} LSTM models ({len(tickers) - len(pending)} up to date, "
+          f"{workers} worker{'s' if workers != 1 else ''})...")
+
+    pool = None
+    if workers > 1 and len(pending) > 1:
+        threads = threads_per_worker or max(1, cpu_count() // workers)
+        # spawn: TensorFlow's runtime is not safe to fork once initialized
+        pool = get_context("spawn").Pool(min(workers, len(pending)), initializer=_init_worker,
+                                         initargs=(cache.cache_dir, threads))
+        imap = pool.imap_unordered
+    else:
+        _worker['cache'] = cache
+        imap = map
+    try:
+        for done, info in enumerate(imap(train_ticker, pending), 1):
+            model_info[info["ticker"]] = info
+            if info["status"] == "trained":
+                print(f"[{done}/{len(pending)}] ✓ {info['ticker']} ({info['train_seconds']:.1f}s)")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
 
-    # Save summary
-    info_df = pd.DataFrame(model_info)
-    info_df.to_csv("../../data/lstm/lstm_trained_models_info.csv", index=False)
+    # Save summary (in ticker order, with per-ticker training time)
+    info_df = pd.DataFrame([model_info[ticker] for ticker in tickers])
+    info_df.to_csv(info_path, index=False)
+    trained = info_df["status"] == "trained"
+    print(f"\n✓ Trained {trained.sum()} LSTM models in {time.perf_counter() - run_start:.1f}s "
+          f"({info_df.loc[trained, 'train_seconds'].sum():.1f}s of model fitting)")
+    return info_df
 
 if __name__ == "__main__":
-    train_lstm()
+    parser = argparse.ArgumentParser(description="Train LSTM models (one per ticker by default)")
+    parser.add_argument("--tf-data", action="store_true",
+                        help="stream training windows through tf.data instead of in-memory arrays")
+    parser.add_argument("--global", dest="global_model", action="store_true",
+                        help="train one model shared by all tickers and compare it with the per-ticker models")
+    parser.add_argument("--parity-only", action="store_true",
+                        help="only compare the saved global model with the per-ticker models")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes training tickers in parallel (default: 1)")
+    parser.add_argument("--threads-per-worker", type=int,
+                        help="TensorFlow threads per worker (default: cores / workers)")
+    parser.add_argument("--force", action="store_true",
+                        help="retrain tickers whose model is already newer than their data")
+    args = parser.parse_args()
+    if args.global_model or args.parity_only:
+        from algorithms.lstm.global_lstm import train_global_lstm, parity_report
+        cache = open_matrix_cache()
+        global_model = None if args.parity_only else train_global_lstm(cache)
+        if os.path.exists("../../data/lstm/lstm_trained_models_info.csv"):
+            parity_report(cache, global_model)
+    else:
+        train_lstm(use_tf_data=args.tf_data, workers=args.workers,
+                   threads_per_worker=args.threads_per_worker, force=args.force)
@@ -0,0 +1,102 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def sliding_windows(series, time_step):
+    """Zero-copy sliding windows over a 1-D (or n x 1) series.
+
+    Returns (X, y) where X[i] = series[i:i + time_step] is a read-only view
+    of shape (n - time_step, time_step, 1), ready for the LSTM input layer,
+    and y[i] = series[i + time_step] is the value following each window.
+    """
+    series = np.asarray(series).reshape(-1)
+    if len(series) <= time_step:
+        return np.empty((0, time_step, 1), dtype=series.dtype), np.empty(0, dtype=series.dtype)
+    X = sliding_window_view(series[:-1], time_step)[..., np.newaxis]
+    y = series[time_step:]
+    return X, y
+
+
+def window_batches(series, time_step, batch_size=32, start=0, stop=None, shuffle=False, seed=None):
+    """Yield (X, y) batches of windows start..stop, copying one batch at a time"""
+    X, y = sliding_windows(series, time_step)
+    index = np.arange(len(X))[start:stop]
+    if shuffle:
+        np.random.default_rng(seed).shuffle(index)
+    for i in range(0, len(index), batch_size):
+        batch = index[i:i + batch_size]
+        if not shuffle:
+            batch = slice(batch[0], batch[-1] + 1)  # contiguous: one copy from the view
+        yield np.ascontiguousarray(X[batch], dtype=np.float32), np.ascontiguousarray(y[batch], dtype=np.float32)
+
+
+def window_dataset(series, time_step, batch_size=32, start=0, stop=None, shuffle=False):
+    """tf.data.Dataset of batched windows, materialized lazily per batch and prefetched.
+
+    With shuffle=True the windows are reshuffled every epoch, like
+    Model.fit(X, y, shuffle=True) does for in-memory arrays.
+    """
+    import tensorflow as tf
+
+    def generate():
+        # Called once per epoch; a fresh unseeded shuffle each time
+        return window_batches(series, time_step, batch_size, start, stop, shuffle)
+
+    dataset = tf.data.Dataset.from_generator(
+        generate,
+        output_signature=(
+            tf.TensorSpec(shape=(None, time_step, 1), dtype=tf.float32),
+            tf.TensorSpec(shape=(None,), dtype=tf.float32),
+        ))
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def pooled_window_batches(series_list, time_step, batch_size=256, bounds=None, shuffle=False, seed=None):
+    """Yield (X, ids, y) batches of windows drawn from several series.
+
+    Windows never cross from one series into the next. `bounds[i]` is a
+    (start, stop) slice of series i's windows to use (default: all), and
+    ids[k] is the position in `series_list` of the series window k came
+    from. Each batch is gathered from one flat array, one copy per batch.
+    """
+    series_list = [np.asarray(s, dtype=np.float32).reshape(-1) for s in series_list]
+    flat = np.concatenate(series_list) if series_list else np.empty(0, dtype=np.float32)
+    base = np.concatenate([[0], np.cumsum([len(s) for s in series_list])[:-1]]).astype(np.int64)
+
+    ids, starts = [], []
+    for i, s in enumerate(series_list):
+        window_index = np.arange(max(len(s) - time_step, 0))
+        if bounds is not None:
+            window_index = window_index[slice(*bounds[i])]
+        ids.append(np.full(len(window_index), i, dtype=np.int32))
+        starts.append(base[i] + window_index)
+    ids = np.concatenate(ids) if ids else np.empty(0, dtype=np.int32)
+    starts = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+
+    order = np.arange(len(starts))
+    if shuffle:
+        np.random.default_rng(seed).shuffle(order)
+    offsets = np.arange(time_step)
+    for i in range(0, len(order), batch_size):
+        batch = order[i:i + batch_size]
+        batch_starts = starts[batch]
+        yield flat[batch_starts[:, None] + offsets][..., np.newaxis], ids[batch], flat[batch_starts + time_step]
+
+
+def pooled_window_dataset(series_list, time_step, batch_size=256, bounds=None, shuffle=False):
+    """tf.data.Dataset of ({'window': X, 'ticker': ids}, y) batches from several series"""
+    import tensorflow as tf
+
+    def generate():
+        # Called once per epoch; with shuffle, tickers are mixed within every batch
+        for X, ids, y in pooled_window_batches(series_list, time_step, batch_size, bounds, shuffle):
+            yield {'window': X, 'ticker': ids}, y
+
+    dataset = tf.data.Dataset.from_generator(
+        generate,
+        output_signature=(
+            {'window': tf.TensorSpec(shape=(None, time_step, 1), dtype=tf.float32),
+             'ticker': tf.TensorSpec(shape=(None,), dtype=tf.int32)},
+            tf.TensorSpec(shape=(None,), dtype=tf.float32),
+        ))
+    return dataset.prefetch(tf.data.AUTOTUNE)
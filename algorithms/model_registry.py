@@ -0,0 +1,143 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def estimate_nbytes(model):
+    """Rough resident size of a loaded model"""
+    if hasattr(model, 'nbytes'):
+        return int(model.nbytes)
+    if hasattr(model, 'count_params'):
+        return int(model.count_params()) * 4  # float32 weights
+    return sys.getsizeof(model)
+
+
+class ModelRegistry:
+    """Loads models on first use and keeps the most recently used ones resident.
+
+    `loader(key)` loads one model. Once more than `max_models` models or
+    `max_bytes` bytes (as measured by `sizeof`) are resident, the least
+    recently used ones are evicted. Keys whose load failed are remembered
+    apart from the models (they do not count towards the limits) and are
+    not retried until clear(). Safe to share between threads; loads of
+    different keys run outside the lock.
+    """
+
+    def __init__(self, loader, max_models=None, max_bytes=None, sizeof=estimate_nbytes):
+        self.loader = loader
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._models = OrderedDict()  # key -> (model, nbytes)
+        self._failed = {}  # key -> exception raised by its load
+        self._lock = threading.Lock()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.failed_lookups = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def __getitem__(self, key):
+        """Return the model for `key`, loading it if needed.
+
+        Load errors propagate, and the same error is raised again on later
+        lookups of `key` without calling the loader.
+        """
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return self._models[key][0]
+            if key in self._failed:
+                self.failed_lookups += 1
+                raise self._failed[key]
+            self.misses += 1
+
+        start = time.perf_counter()
+        try:
+            model = self.loader(key)
+            nbytes = self.sizeof(model)
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+                self.load_seconds += time.perf_counter() - start
+                self._failed[key] = e
+            raise
+
+        with self._lock:
+            self.load_seconds += time.perf_counter() - start
+            if key not in self._models:
+                self._models[key] = (model, nbytes)
+                self.resident_bytes += nbytes
+                self._evict()
+        return model
+
+    def get(self, key, default=None):
+        """Like dict.get: `default` if the model cannot be loaded"""
+        try:
+            return self[key]
+        except Exception:
+            return default
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._models
+
+    def __len__(self):
+        with self._lock:
+            return len(self._models)
+
+    def _evict(self):
+        # Always keep the model that was just loaded
+        while len(self._models) > 1 and (
+                (self.max_models is not None and len(self._models) > self.max_models) or
+                (self.max_bytes is not None and self.resident_bytes > self.max_bytes)):
+            _, (_, nbytes) = self._models.popitem(last=False)
+            self.resident_bytes -= nbytes
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._failed.clear()
+            self.resident_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'failures': self.failures,
+                'failed_lookups': self.failed_lookups,
+                'evictions': self.evictions,
+                'load_seconds': self.load_seconds,
+                'resident_models': len(self._models),
+                'resident_bytes': self.resident_bytes,
+            }
+
+    def summary(self):
+        s = self.stats()
+        return (f"Model registry: {s['hits']} hits, {s['misses']} misses "
+                f"({s['failures']} failed), {s['failed_lookups']} lookups of failed models, "
+                f"{s['evictions']} evictions, "
+                f"{s['load_seconds']:.2f}s loading, {s['resident_models']} resident "
+                f"({s['resident_bytes'] / 1e6:.1f} MB)")
+
+
+def arima_registry(models_dir='../../data/arima/models', **limits):
+    """Registry of CompactARIMA models keyed by ticker"""
+    from algorithms.ARIMA.compact_arima import load_compact_model
+
+    return ModelRegistry(lambda ticker: load_compact_model(ticker, models_dir), **limits)
+
+
+def lstm_registry(model_paths, **limits):
+    """Registry of Keras models keyed by ticker; `model_paths` maps ticker -> .keras path"""
+    def load(ticker):
+        from tensorflow.keras.models import load_model
+        return load_model(model_paths[ticker])
+
+    return ModelRegistry(load, **limits)
@@ -0,0 +1,128 @@
+import itertools
+import os
+from multiprocessing import Pool, cpu_count, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from algorithms.backtest import PriceMatrix, matrix_from_cache, run_backtest, compute_metrics
+
+# Per-worker state, filled in once by _init_worker
+_worker = {}
+
+
+def _share(array):
+    """Copy `array` into a new shared memory block"""
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm
+
+
+def _attach(name, shape, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _init_worker(prices_spec, present_spec, dates, tickers, start,
+                 build_strategy, initial_capital):
+    """Attach to the shared price matrix once per worker process"""
+    prices_shm, prices = _attach(*prices_spec)
+    present_shm, present = _attach(*present_spec)
+    _worker.update(
+        shm=(prices_shm, present_shm),  # keep the mappings alive
+        matrix=PriceMatrix(dates, tickers, prices, present),
+    )
+    _init_common(start, build_strategy, initial_capital)
+
+
+def _init_cache_worker(source, start, build_strategy, initial_capital):
+    """Map the on-disk matrix cache once per worker process"""
+    from price_store import MatrixCache
+
+    cache_dir, column = source
+    _worker['matrix'] = matrix_from_cache(MatrixCache(cache_dir), column)
+    _init_common(start, build_strategy, initial_capital)
+
+
+def _init_common(start, build_strategy, initial_capital):
+    _worker.update(
+        start=start,
+        build_strategy=build_strategy,
+        initial_capital=initial_capital,
+    )
+
+
+def _run_combo(params):
+    signals, rule = _worker['build_strategy'](params)
+    result = run_backtest(_worker['matrix'], _worker['start'], signals, rule,
+                          initial_capital=_worker['initial_capital'])
+    metrics, _ = compute_metrics(result)
+    return {
+        **params,
+        'total_return': metrics['total_return'],
+        'annualized_return': metrics['annualized_return'],
+        'sharpe_ratio': metrics['sharpe_ratio'],
+        'max_drawdown': metrics['max_drawdown'],
+        'volatility': metrics['volatility'],
+        'final_value': metrics['final_value'],
+        'trades': result.portfolio.trade_count,
+    }
+
+
+def expand_grid(grid):
+    """Turn {name: [values, ...]} into a list of parameter dicts"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def run_sweep(matrix, start, build_strategy, grid, workers=None,
+              initial_capital=100000, output_path=None, rank_by='sharpe_ratio'):
+    """Backtest every combination in `grid` in parallel and rank the results.
+
+    `build_strategy(params)` must be a picklable (module-level) callable that
+    returns the (signals, rule) pair for one parameter combination; rules
+    should be built with verbose=False. The price matrix is copied once into
+    shared memory and mapped by every worker, so tasks only carry the
+    parameter dict. A matrix from matrix_from_cache is not copied at all:
+    workers map the same .npy files.
+    """
+    combos = expand_grid(grid)
+    workers = min(workers or cpu_count(), len(combos))
+    print(f"Sweeping {len(combos)} parameter combinations on {workers} workers...")
+
+    shms = []
+    try:
+        source = getattr(matrix, 'source', None)
+        if source:
+            initializer = _init_cache_worker
+            initargs = (source, start, build_strategy, initial_capital)
+        else:
+            prices = np.ascontiguousarray(matrix.prices)
+            present = np.ascontiguousarray(matrix.present)
+            shms = [_share(prices), _share(present)]
+            initializer = _init_worker
+            initargs = (
+                (shms[0].name, prices.shape, prices.dtype),
+                (shms[1].name, present.shape, present.dtype),
+                matrix.dates, matrix.tickers, start, build_strategy, initial_capital,
+            )
+        rows = []
+        with Pool(workers, initializer=initializer, initargs=initargs) as pool:
+            for i, row in enumerate(pool.imap_unordered(_run_combo, combos), 1):
+                rows.append(row)
+                if i % max(1, len(combos) // 10) == 0 or i == len(combos):
+                    print(f"Progress: {i}/{len(combos)} combinations")
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+    results = pd.DataFrame(rows).sort_values(rank_by, ascending=False).reset_index(drop=True)
+    results.insert(0, 'rank', np.arange(1, len(results) + 1))
+
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        results.to_csv(output_path, index=False)
+        print(f"Sweep results saved to {output_path}")
+
+    return results
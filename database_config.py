@@ -1,22 +1,203 @@
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
 import mysql.connector
 from mysql.connector import Error
 
+
+class ConnectionPool:
+    """Thread-safe pool of MySQL connections.
+
+    Connections are opened lazily, up to `size` at a time; once all are
+    checked out, acquire() waits up to `timeout` seconds for one to be
+    returned. A connection that sat idle for more than
+    `health_check_interval` seconds is pinged before reuse and replaced if
+    the server dropped it.
+    """
+
+    def __init__(self, size=5, timeout=30.0, health_check_interval=60.0, **connect_args):
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.connect_args = connect_args
+        self._idle = []  # (connection, last_used) stack, most recent last
+        self._open = 0
+        self._cond = threading.Condition()
+        self.creations = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.health_check_failures = 0
+
+    def _connect(self):
+        connection = mysql.connector.connect(**self.connect_args)
+        with self._cond:
+            self.creations += 1
+        return connection
+
+    def _healthy(self, connection, last_used):
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Error:
+            with self._cond:
+                self.health_check_failures += 1
+            try:
+                connection.close()
+            except Error:
+                pass
+            return False
+
+    def acquire(self):
+        """Check out a connection (raises Error if none can be opened in time)"""
+        deadline = None
+        with self._cond:
+            while not self._idle and self._open >= self.size:
+                if deadline is None:
+                    self.waits += 1
+                    deadline = time.monotonic() + self.timeout
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Error(msg=f"Timed out waiting for a connection (pool size {self.size})")
+                started = time.monotonic()
+                self._cond.wait(remaining)
+                self.wait_seconds += time.monotonic() - started
+            idle = self._idle.pop() if self._idle else None
+            if idle is None:
+                self._open += 1
+            self.checkouts += 1
+
+        try:
+            if idle is not None and self._healthy(*idle):
+                return idle[0]
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, connection):
+        """Return a checked-out connection, rolling back only a still-open transaction
+
+        in_transaction comes from the last server status, so returning a
+        clean connection costs no round-trip.
+        """
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+            reusable = True
+        except Error:
+            reusable = False
+        with self._cond:
+            if reusable:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self._open -= 1
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for connection, _ in idle:
+            try:
+                connection.close()
+            except Error:
+                pass
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'creations': self.creations,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_seconds': self.wait_seconds,
+                'health_check_failures': self.health_check_failures,
+            }
+
+
+class PooledConnection:
+    """A checked-out connection; close() returns it to the pool instead of disconnecting
+
+    A connection that is garbage collected without close() is returned too,
+    so a forgotten close() cannot exhaust the pool.
+    """
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+        self._finalizer = weakref.finalize(self, pool.release, connection)
+        self._finalizer.atexit = False
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise Error(msg="Connection was returned to the pool")
+        return getattr(self._connection, name)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection = None
+            self._finalizer()  # releases the connection, at most once
+
+    def is_connected(self):
+        return self._connection is not None and self._connection.is_connected()
+
+
 class DatabaseConfig:
-    def __init__(self):
+    # One pool per database/user, shared by every manager in the process
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, pool_size=5, pool_timeout=30.0):
         self.host = 'localhost'
         self.database = 'stock_portfolio'
         self.user = 'admin'  # Change as needed
         self.password = 'password'  # Change as needed
-    
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+
+    def get_pool(self):
+        key = (self.host, self.database, self.user)
+        with self._pools_lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(
+                    size=self.pool_size,
+                    timeout=self.pool_timeout,
+                    host=self.host,
+                    database=self.database,
+                    user=self.user,
+                    password=self.password
+                )
+                self._pools[key] = pool
+            return pool
+
     def get_connection(self):
+        """Check out a pooled connection; call close() on it to return it"""
+        pool = self.get_pool()
         try:
-            connection = mysql.connector.connect(
-                host=self.host,
-                database=self.database,
-                user=self.user,
-                password=self.password
-            )
-            return connection
+            return PooledConnection(pool, pool.acquire())
         except Error as e:
             print(f"Error connecting to MySQL: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    @contextmanager
+    def connection(self):
+        """`with db_config.connection() as connection:` checkout that is always returned"""
+        pool = self.get_pool()
+        connection = PooledConnection(pool, pool.acquire())
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def pool_stats(self):
+        return self.get_pool().stats()
@@ -46,4 +46,11 @@ CREATE TABLE stock_data (
     close_price DECIMAL(10,2),
     volume BIGINT,
     UNIQUE KEY unique_stock_date (stock_symbol, date)
-);
\ No newline at end of file
+);
+
+-- Cached results of remote symbol validation (see symbol_cache.py)
+CREATE TABLE IF NOT EXISTS symbol_metadata (
+    stock_symbol VARCHAR(10) PRIMARY KEY,
+    is_valid BOOLEAN NOT NULL,
+    checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
@@ -1,127 +1,132 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
+import argparse
 from datetime import datetime
+from stock_downloader import ConcurrentDownloader
+from price_store import write_prices, build_matrix_cache, list_tickers, STORE_DIR
 import warnings
 warnings.filterwarnings("ignore")
 
-def fetch_stock_data(tickers):
-    """Fetch stock data for multiple tickers"""
-    all_data = []
+TICKERS = [
+    "AAPL","MSFT","GOOG","META","AMZN","NFLX","TSLA",
+    "NVDA","AMD","INTC","QCOM","AVGO","MU","TXN","AMAT","LRCX",
+    "CRM","ORCL","ADBE","NOW","SNOW","DDOG","SHOP","MDB",
+    "CSCO","IBM","HPE","DELL","HPQ","ANET",
+    "PYPL","V","MA"
+]
+
+def history_to_frame(ticker, data):
+    """Convert a yfinance history frame into the long ticker/date layout"""
+    data = data.reset_index()
+    data['ticker'] = ticker
+    
+    data = data.rename(columns={
+        'Date': 'date',
+        'Open': 'open_price',
+        'High': 'high_price', 
+        'Low': 'low_price',
+        'Close': 'close_price',
+        'Adj Close': 'adj_close_price',
+        'Volume': 'volume'
+    })
+    return data[['ticker', 'date', 'open_price', 'high_price', 'low_price', 'close_price', 'adj_close_price', 'volume']]
+
+def fetch_stock_data(tickers, downloader=None):
+    """Fetch stock data for multiple tickers (concurrently, see ConcurrentDownloader)"""
+    all_data = {}
+    downloader = downloader or ConcurrentDownloader()
     
     print(f"Fetching {len(tickers)} tickers for last 10 years...")
     
-    for ticker in tickers:
+    for result in downloader.download(tickers, period="10y", auto_adjust=False):
+        ticker = result.symbol
+        if not result.ok:
+            print(f"✗ {ticker}: Error - {result.error}")
+            continue
         try:
-            stock = yf.Ticker(ticker)
-            data = stock.history(period="10y", auto_adjust=False)
+            data = result.data
             
             if not data.empty:
-                data = data.reset_index()
-                data['ticker'] = ticker
-                
-                data = data.rename(columns={
-                    'Date': 'date',
-                    'Open': 'open_price',
-                    'High': 'high_price', 
-                    'Low': 'low_price',
-                    'Close': 'close_price',
-                    'Adj Close': 'adj_close_price',
-                    'Volume': 'volume'
-                })
-                data = data[['ticker', 'date', 'open_price', 'high_price', 'low_price', 'close_price', 'adj_close_price', 'volume']]
-                all_data.append(data)
+                all_data[ticker] = history_to_frame(ticker, data)
             else:
                 print(f"✗ {ticker}: No data found")
                 
         except Exception as e:
             print(f"✗ {ticker}: Error - {e}")
     
+    # Keep the requested ticker order regardless of completion order
+    all_data = [all_data[ticker] for ticker in tickers if ticker in all_data]
     return pd.concat(all_data, ignore_index=True) if all_data else pd.DataFrame()
 
 def fill_missing_data(df, method='interpolation'):
-    """Fill missing data using different methods"""
+    """Fill missing data using different methods
+    
+    Every ticker's business-day calendar is built into one (ticker, date)
+    MultiIndex, the missing pairs are appended in a single concat, and only
+    tickers that had gaps are filled, per ticker, with groupby.
+    """
     print(f"Filling missing data...")
     
-    filled_data = []
-    
-    for ticker in df['ticker'].unique():
-        ticker_data = df[df['ticker'] == ticker].copy()
-        
-        full_range = pd.bdate_range(start=ticker_data['date'].min(),
-                                  end=ticker_data['date'].max())
-        
-        # Find missing dates
-        missing_dates = full_range.difference(ticker_data['date'])
-        
-        if len(missing_dates) > 0:
-            
-            # Create missing rows
-            missing_rows = pd.DataFrame({
-                'ticker': ticker,
-                'date': missing_dates,
-                'open_price': np.nan,
-                'high_price': np.nan,
-                'low_price': np.nan,
-                'close_price': np.nan,
-                'volume': np.nan
-            })
-            
-            # Combine and sort
-            ticker_data = pd.concat([ticker_data, missing_rows], ignore_index=True)
-            ticker_data = ticker_data.sort_values('date').reset_index(drop=True)
-            
-            # Fill missing values
-            if method == 'interpolation':
-                ticker_data = ticker_data.interpolate()
-            elif method == 'backward':
-                ticker_data = ticker_data.bfill()
-            elif method == 'forward':
-                ticker_data = ticker_data.ffill()
-        
-        filled_data.append(ticker_data)
-    
-    return pd.concat(filled_data, ignore_index=True)
+    # One business-day calendar, sliced to each ticker's first..last date
+    bounds = df.groupby('ticker', sort=False)['date'].agg(['min', 'max'])
+    business_days = pd.bdate_range(start=bounds['min'].min(), end=bounds['max'].max())
+    lo = business_days.searchsorted(pd.DatetimeIndex(bounds['min']).normalize(), side='left')
+    hi = business_days.searchsorted(pd.DatetimeIndex(bounds['max']).normalize(), side='right')
+    positions = np.concatenate([np.arange(a, b) for a, b in zip(lo, hi)])
+    calendar = pd.MultiIndex.from_arrays(
+        [np.repeat(bounds.index.to_numpy(), hi - lo), business_days[positions]],
+        names=['ticker', 'date'])
+    
+    # Find missing dates
+    missing = calendar.difference(pd.MultiIndex.from_frame(df[['ticker', 'date']]))
+    if len(missing) == 0:
+        return df.reset_index(drop=True)
+    
+    # Create missing rows
+    missing_rows = missing.to_frame(index=False)
+    for col in ['open_price', 'high_price', 'low_price', 'close_price', 'volume']:
+        missing_rows[col] = np.nan
+    
+    # Combine and sort
+    filled = pd.concat([df, missing_rows], ignore_index=True)
+    filled = filled.sort_values(['ticker', 'date'], kind='stable').reset_index(drop=True)
+    
+    # Fill missing values, within each ticker that had gaps
+    gaps = filled['ticker'].isin(missing.get_level_values('ticker').unique())
+    value_cols = [col for col in filled.columns if col not in ('ticker', 'date')]
+    grouped = filled.loc[gaps, value_cols].groupby(filled.loc[gaps, 'ticker'], sort=False)
+    if method == 'interpolation':
+        filled.loc[gaps, value_cols] = grouped.transform(lambda values: values.interpolate())
+    elif method == 'backward':
+        filled.loc[gaps, value_cols] = grouped.bfill()
+    elif method == 'forward':
+        filled.loc[gaps, value_cols] = grouped.ffill()
+    
+    return filled
 
 def calculate_metrics(df):
     """Calculate basic stock metrics for each ticker"""
     print("Calculating metrics...")
     
-    metrics_data = []
-    
-    for ticker in df['ticker'].unique():
-        ticker_data = df[df['ticker'] == ticker].copy().sort_values('date')
-        
-        # Daily returns
-        ticker_data['daily_return'] = ticker_data['close_price'].pct_change()
-        
-        # Cumulative returns
-        ticker_data['cumulative_return'] = (1 + ticker_data['daily_return']).cumprod() - 1
-        
-        # Rolling volatility (30-day)
-        ticker_data['volatility'] = ticker_data['daily_return'].rolling(window=30).std()
-        
-        metrics_data.append(ticker_data)
-    
-    return pd.concat(metrics_data, ignore_index=True)
-
-def generate_training_csv():
-    """Generate comprehensive training dataset"""
-    tickers = [
-        "AAPL","MSFT","GOOG","META","AMZN","NFLX","TSLA",
-        "NVDA","AMD","INTC","QCOM","AVGO","MU","TXN","AMAT","LRCX",
-        "CRM","ORCL","ADBE","NOW","SNOW","DDOG","SHOP","MDB",
-        "CSCO","IBM","HPE","DELL","HPQ","ANET",
-        "PYPL","V","MA"
-    ]
+    df = df.sort_values(['ticker', 'date'], kind='stable').reset_index(drop=True)
+    grouped = df.groupby('ticker', sort=False)
     
-    df = fetch_stock_data(tickers)
+    # Daily returns
+    df['daily_return'] = grouped['close_price'].pct_change()
     
-    if df.empty:
-        print("No data fetched!")
-        return
+    # Cumulative returns
+    df['cumulative_return'] = (1 + df['daily_return']).groupby(df['ticker'], sort=False).cumprod() - 1
     
-    df_filled = fill_missing_data(df, method='interpolation')
+    # Rolling volatility (30-day)
+    df['volatility'] = (df.groupby('ticker', sort=False)['daily_return']
+                        .rolling(window=30).std()
+                        .reset_index(level=0, drop=True))
+    
+    return df
+
+def process_data(df, method='interpolation'):
+    """Fill gaps, add metrics and normalize column types for output"""
+    df_filled = fill_missing_data(df, method=method)
     
     df_final = calculate_metrics(df_filled)
     
@@ -132,16 +137,92 @@ def generate_training_csv():
     numeric_cols = ['open_price', 'high_price', 'low_price', 'close_price', 'volume', 'daily_return', 'cumulative_return', 'volatility']
     for col in numeric_cols:
         df_final[col] = pd.to_numeric(df_final[col], errors='coerce')
+    return df_final
+
+def generate_training_csv(tickers=TICKERS):
+    """Generate comprehensive training dataset"""
+    df = fetch_stock_data(tickers)
+    
+    if df.empty:
+        print("No data fetched!")
+        return
+    
+    df_final = process_data(df, method='interpolation')
     
     filename = 'data/processed_tech_stock_data.csv'
     df_final.to_csv(filename, index=False)
     
-    print(f"\n✓ Dataset saved to {filename}")
+    # Typed, per-ticker Parquet copy read by the training/backtest scripts
+    write_prices(df_final, overwrite=True)
+    build_matrix_cache()
+    
+    print(f"\n✓ Dataset saved to {filename} and {STORE_DIR}")
     print(f"Records: {len(df_final)}, Tickers: {df_final['ticker'].nunique()}, Columns: {len(df_final.columns)}")
     print(f"Date range: {df_final['date'].min()} to {df_final['date'].max()}")
     
     
     return filename
 
+def generate_training_store(tickers=TICKERS, method='interpolation', resume=True,
+                            chunk_size=50, downloader=None, build_matrix=True):
+    """Stream tickers through fetch -> fill -> metrics -> Parquet store one at a time
+    
+    Only `chunk_size` tickers are downloaded at once, and each is written to
+    its own store partition as soon as it is processed, so memory stays
+    bounded whatever the universe size. With resume=True, tickers already in
+    the store are skipped, so an interrupted run can simply be restarted.
+    The matrix cache is then rebuilt from the store one ticker at a time
+    (build_matrix=False skips it). Returns the number of tickers written.
+    """
+    downloader = downloader or ConcurrentDownloader()
+    done = set(list_tickers()) if resume else set()
+    pending = [ticker for ticker in dict.fromkeys(tickers) if ticker not in done]
+    print(f"Streaming {len(pending)} tickers into {STORE_DIR} ({len(tickers) - len(pending)} already written)...")
+    
+    written = 0
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        for result in downloader.download(chunk, period="10y", auto_adjust=False):
+            ticker = result.symbol
+            if not result.ok:
+                print(f"✗ {ticker}: Error - {result.error}")
+                continue
+            try:
+                if result.data.empty:
+                    print(f"✗ {ticker}: No data found")
+                    continue
+                df_final = process_data(history_to_frame(ticker, result.data), method=method)
+                write_prices(df_final)
+                written += 1
+                print(f"✓ {ticker}: {len(df_final)} rows ({written}/{len(pending)})")
+            except Exception as e:
+                print(f"✗ {ticker}: Error - {e}")
+    
+    if build_matrix:
+        build_matrix_cache()
+    print(f"\n✓ {written} tickers written to {STORE_DIR}")
+    return written
+
 if __name__ == "__main__":
-    generate_training_csv()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Generate the processed training dataset')
+    parser.add_argument('--stream', action='store_true',
+                        help='process tickers one at a time straight into the Parquet store (no CSV)')
+    parser.add_argument('--tickers', help='comma-separated tickers (default: the built-in tech list)')
+    parser.add_argument('--tickers-file', help='file with one ticker per line')
+    parser.add_argument('--restart', action='store_true',
+                        help='with --stream, rewrite tickers already in the store')
+    parser.add_argument('--chunk-size', type=int, default=50,
+                        help='with --stream, tickers downloaded at once')
+    args = parser.parse_args()
+    
+    tickers = TICKERS
+    if args.tickers:
+        tickers = [t.strip().upper() for t in args.tickers.split(',') if t.strip()]
+    elif args.tickers_file:
+        with open(args.tickers_file) as f:
+            tickers = [line.strip().upper() for line in f if line.strip()]
+    
+    if args.stream:
+        generate_training_store(tickers, resume=not args.restart, chunk_size=args.chunk_size)
+    else:
+        generate_training_csv(tickers)
\ No newline at end of file
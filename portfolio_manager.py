@@ -75,8 +75,8 @@ class PortfolioManager:
         """Add stock to portfolio with validation"""
         # Check for comma-separated symbols
         if ',' in stock_symbol:
-            print(f"Error: Only one stock symbol allowed. Use separate commands for multiple stocks.")
-            print(f"Example: python3 portfolio_manager.py add {username} \"{portfolio_name}\" TSLA")
+            print(f"Error: Only one stock symbol allowed. Use add-many for multiple stocks.")
+            print(f"Example: python3 portfolio_manager.py add-many {username} \"{portfolio_name}\" {stock_symbol}")
             return False
         
         # Validate stock symbol with yfinance API
@@ -84,36 +84,25 @@ class PortfolioManager:
             print(f"Invalid stock symbol: {stock_symbol.upper()}")
             return False
         
-        # Check if stock data exists in database
-        connection = self.db_config.get_connection()
-        if not connection:
-            return False
-        
-        cursor = connection.cursor()
-        try:
-            cursor.execute("SELECT DISTINCT stock_symbol FROM stock_data WHERE stock_symbol = %s", 
-                         (stock_symbol.upper(),))
-            if not cursor.fetchone():
-                print(f"Stock {stock_symbol.upper()} not found in database. Please fetch stock data first.")
-                return False
-        except Exception as e:
-            print(f"Error checking stock data: {e}")
-            return False
-        finally:
-            cursor.close()
-            connection.close()
-        
         user_id = self.user_manager.get_user_by_username(username)
         if not user_id:
             print(f"User '{username}' not found!")
             return False
         
+        # Stock check and insert share one pooled connection
         connection = self.db_config.get_connection()
         if not connection:
             return False
         
         cursor = connection.cursor()
         try:
+            # Check if stock data exists in database
+            cursor.execute("SELECT 1 FROM stock_data WHERE stock_symbol = %s LIMIT 1", 
+                         (stock_symbol.upper(),))
+            if not cursor.fetchone():
+                print(f"Stock {stock_symbol.upper()} not found in database. Please fetch stock data first.")
+                return False
+            
             cursor.execute("SELECT id FROM portfolios WHERE user_id = %s AND name = %s", 
                          (user_id, portfolio_name))
             result = cursor.fetchone()
@@ -174,6 +163,129 @@ class PortfolioManager:
             cursor.close()
             connection.close()
     
+    def _resolve_portfolio(self, cursor, username, portfolio_name):
+        """Portfolio id for a user's portfolio name, or None (with a message)"""
+        cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
+        result = cursor.fetchone()
+        if not result:
+            print(f"User '{username}' not found!")
+            return None
+        
+        cursor.execute("SELECT id FROM portfolios WHERE user_id = %s AND name = %s", 
+                     (result[0], portfolio_name))
+        result = cursor.fetchone()
+        if not result:
+            print(f"Portfolio '{portfolio_name}' not found for user '{username}'!")
+            return None
+        return result[0]
+    
+    def add_stocks_to_portfolio(self, username, portfolio_name, stock_symbols):
+        """Add many stocks to a portfolio in one transaction
+        
+        Symbols are validated against stock_data with a single IN (...) query
+        (stocks must be fetched first, as for add) and inserted with one
+        multi-row statement. Returns the list of symbols added, or False.
+        """
+        symbols = list(dict.fromkeys(s.strip().upper() for s in stock_symbols if s.strip()))
+        if not symbols:
+            print("No stock symbols given!")
+            return False
+        
+        connection = self.db_config.get_connection()
+        if not connection:
+            return False
+        
+        cursor = connection.cursor()
+        try:
+            portfolio_id = self._resolve_portfolio(cursor, username, portfolio_name)
+            if not portfolio_id:
+                return False
+            
+            placeholders = ', '.join(['%s'] * len(symbols))
+            cursor.execute(f"SELECT DISTINCT stock_symbol FROM stock_data WHERE stock_symbol IN ({placeholders})", 
+                         tuple(symbols))
+            known = {row[0] for row in cursor.fetchall()}
+            cursor.execute(f"""
+                SELECT stock_symbol FROM portfolio_stocks
+                WHERE portfolio_id = %s AND stock_symbol IN ({placeholders})
+            """, (portfolio_id, *symbols))
+            existing = {row[0] for row in cursor.fetchall()}
+            
+            missing = [s for s in symbols if s not in known]
+            duplicates = [s for s in symbols if s in known and s in existing]
+            to_add = [s for s in symbols if s in known and s not in existing]
+            
+            if to_add:
+                values = ', '.join(['(%s, %s)'] * len(to_add))
+                params = [value for symbol in to_add for value in (portfolio_id, symbol)]
+                cursor.execute(f"INSERT IGNORE INTO portfolio_stocks (portfolio_id, stock_symbol) VALUES {values}", 
+                             tuple(params))
+            connection.commit()
+            
+            if to_add:
+                print(f"Added {len(to_add)} stocks to '{portfolio_name}' for user '{username}': {', '.join(to_add)}")
+            if duplicates:
+                print(f"Already in portfolio '{portfolio_name}': {', '.join(duplicates)}")
+            if missing:
+                print(f"Not found in database (fetch stock data first): {', '.join(missing)}")
+            return to_add
+            
+        except Exception as e:
+            connection.rollback()
+            print(f"Error adding stocks: {e}")
+            return False
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def remove_stocks_from_portfolio(self, username, portfolio_name, stock_symbols):
+        """Remove many stocks from a portfolio with one DELETE; returns the symbols removed, or False"""
+        symbols = list(dict.fromkeys(s.strip().upper() for s in stock_symbols if s.strip()))
+        if not symbols:
+            print("No stock symbols given!")
+            return False
+        
+        connection = self.db_config.get_connection()
+        if not connection:
+            return False
+        
+        cursor = connection.cursor()
+        try:
+            portfolio_id = self._resolve_portfolio(cursor, username, portfolio_name)
+            if not portfolio_id:
+                return False
+            
+            placeholders = ', '.join(['%s'] * len(symbols))
+            cursor.execute(f"""
+                SELECT stock_symbol FROM portfolio_stocks
+                WHERE portfolio_id = %s AND stock_symbol IN ({placeholders})
+            """, (portfolio_id, *symbols))
+            existing = {row[0] for row in cursor.fetchall()}
+            
+            to_remove = [s for s in symbols if s in existing]
+            not_found = [s for s in symbols if s not in existing]
+            
+            if to_remove:
+                cursor.execute(f"""
+                    DELETE FROM portfolio_stocks
+                    WHERE portfolio_id = %s AND stock_symbol IN ({', '.join(['%s'] * len(to_remove))})
+                """, (portfolio_id, *to_remove))
+            connection.commit()
+            
+            if to_remove:
+                print(f"Removed {len(to_remove)} stocks from '{portfolio_name}' for user '{username}': {', '.join(to_remove)}")
+            if not_found:
+                print(f"Not in portfolio '{portfolio_name}': {', '.join(not_found)}")
+            return to_remove
+            
+        except Exception as e:
+            connection.rollback()
+            print(f"Error removing stocks: {e}")
+            return False
+        finally:
+            cursor.close()
+            connection.close()
+    
     def display_user_portfolios(self, username):
         """Display all portfolios for a specific user"""
         user_id = self.user_manager.get_user_by_username(username)
@@ -213,8 +325,12 @@ class PortfolioManager:
             cursor.close()
             connection.close()
     
-    def fetch_portfolio_data(self, username, portfolio_name, start_date, end_date):
-        """Fetch stock data for all stocks in a portfolio"""
+    def fetch_portfolio_data(self, username, portfolio_name, start_date, end_date=None, incremental=False):
+        """Fetch stock data for all stocks in a portfolio
+        
+        With incremental=True only dates after each stock's latest stored row
+        are fetched (up to today); start_date is used for stocks with no data.
+        """
         user_id = self.user_manager.get_user_by_username(username)
         if not user_id:
             print(f"User '{username}' not found!")
@@ -240,7 +356,11 @@ class PortfolioManager:
             
             print(f"Fetching data for '{username}' portfolio '{portfolio_name}' stocks: {', '.join(stocks)}")
             
-            if self.stock_fetcher.fetch_stock_data(stocks, start_date, end_date):
+            if incremental:
+                fetched = self.stock_fetcher.fetch_incremental(stocks, start_date) is not None
+            else:
+                fetched = self.stock_fetcher.fetch_stock_data(stocks, start_date, end_date)
+            if fetched:
                 print("Portfolio data fetched successfully!")
             else:
                 print("Failed to fetch portfolio data!")
@@ -270,10 +390,19 @@ def main():
             manager.add_stock_to_portfolio(sys.argv[2], sys.argv[3], sys.argv[4])
         elif action == "remove" and len(sys.argv) == 5:
             manager.remove_stock_from_portfolio(sys.argv[2], sys.argv[3], sys.argv[4])
+        elif action == "add-many" and len(sys.argv) >= 5:
+            symbols = [s for arg in sys.argv[4:] for s in arg.split(',')]
+            manager.add_stocks_to_portfolio(sys.argv[2], sys.argv[3], symbols)
+        elif action == "remove-many" and len(sys.argv) >= 5:
+            symbols = [s for arg in sys.argv[4:] for s in arg.split(',')]
+            manager.remove_stocks_from_portfolio(sys.argv[2], sys.argv[3], symbols)
         elif action == "display" and len(sys.argv) == 3:
             manager.display_user_portfolios(sys.argv[2])
         elif action == "fetch" and len(sys.argv) == 6:
             manager.fetch_portfolio_data(sys.argv[2], sys.argv[3], sys.argv[4], sys.argv[5])
+        elif action == "update" and len(sys.argv) in (4, 5):
+            start = datetime.strptime(sys.argv[4], '%Y-%m-%d').date() if len(sys.argv) == 5 else None
+            manager.fetch_portfolio_data(sys.argv[2], sys.argv[3], start, incremental=True)
         else:
             print("Usage:")
             print("  python3 portfolio_manager.py create-user <username>")
@@ -282,8 +411,11 @@ def main():
             print("  python3 portfolio_manager.py remove-portfolio <username> <portfolio_name>")
             print("  python3 portfolio_manager.py add <username> <portfolio_name> <stock>")
             print("  python3 portfolio_manager.py remove <username> <portfolio_name> <stock>")
+            print("  python3 portfolio_manager.py add-many <username> <portfolio_name> <stock1,stock2,...>")
+            print("  python3 portfolio_manager.py remove-many <username> <portfolio_name> <stock1,stock2,...>")
             print("  python3 portfolio_manager.py display <username>")
             print("  python3 portfolio_manager.py fetch <username> <portfolio_name> <start_date> <end_date>")
+            print("  python3 portfolio_manager.py update <username> <portfolio_name> [<start_date for new stocks>]")
         return
     
     # Interactive menu
@@ -324,16 +456,22 @@ def main():
         elif choice == '5':
             username = input("Enter username: ").strip()
             portfolio = input("Enter portfolio name: ").strip()
-            stock = input("Enter stock symbol: ").strip()
+            stock = input("Enter stock symbol (comma-separate for several): ").strip()
             if username and portfolio and stock:
-                manager.add_stock_to_portfolio(username, portfolio, stock)
+                if ',' in stock:
+                    manager.add_stocks_to_portfolio(username, portfolio, stock.split(','))
+                else:
+                    manager.add_stock_to_portfolio(username, portfolio, stock)
         
         elif choice == '6':
             username = input("Enter username: ").strip()
             portfolio = input("Enter portfolio name: ").strip()
-            stock = input("Enter stock symbol: ").strip()
+            stock = input("Enter stock symbol (comma-separate for several): ").strip()
             if username and portfolio and stock:
-                manager.remove_stock_from_portfolio(username, portfolio, stock)
+                if ',' in stock:
+                    manager.remove_stocks_from_portfolio(username, portfolio, stock.split(','))
+                else:
+                    manager.remove_stock_from_portfolio(username, portfolio, stock)
         
         elif choice == '7':
             username = input("Enter username: ").strip()
@@ -0,0 +1,282 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.path.join(ROOT_DIR, 'data', 'prices')
+CSV_PATH = os.path.join(ROOT_DIR, 'data', 'processed_tech_stock_data.csv')
+
+PRICE_COLUMNS = ['open_price', 'high_price', 'low_price', 'close_price', 'adj_close_price']
+METRIC_COLUMNS = ['daily_return', 'cumulative_return', 'volatility']
+
+
+def to_store_types(df):
+    """Cast a processed frame to the store schema: datetime64 date, float32 prices, int64 volume"""
+    df = df.copy()
+    df['ticker'] = df['ticker'].astype(str)
+    df['date'] = pd.to_datetime(df['date'])
+    for col in PRICE_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype('float32')
+    if 'volume' in df:
+        df['volume'] = df['volume'].fillna(0).round().astype('int64')
+    for col in METRIC_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype('float64')
+    return df
+
+
+def ticker_path(ticker, store_dir=STORE_DIR):
+    return os.path.join(store_dir, f'ticker={ticker}')
+
+
+def write_prices(df, store_dir=STORE_DIR, overwrite=False):
+    """Write a processed frame as Parquet, one partition directory per ticker
+
+    Tickers in `df` replace their existing partitions; other tickers are
+    kept unless `overwrite` is set.
+    """
+    if overwrite and os.path.isdir(store_dir):
+        shutil.rmtree(store_dir)
+    os.makedirs(store_dir, exist_ok=True)
+
+    df = to_store_types(df)
+    for ticker, ticker_data in df.groupby('ticker', sort=False):
+        # Write into a hidden directory (ignored by readers) and rename it into
+        # place, so an interrupted write never leaves a partial partition
+        path = ticker_path(ticker, store_dir)
+        tmp_path = os.path.join(store_dir, f'.tmp-ticker={ticker}')
+        if os.path.isdir(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        ticker_data = ticker_data.drop(columns='ticker').sort_values('date')
+        ticker_data.to_parquet(os.path.join(tmp_path, 'part-0.parquet'), index=False)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+    return store_dir
+
+
+def list_tickers(store_dir=STORE_DIR):
+    """Tickers in the store, sorted"""
+    if not os.path.isdir(store_dir):
+        return []
+    return sorted(name[len('ticker='):] for name in os.listdir(store_dir)
+                  if name.startswith('ticker='))
+
+
+def _filters(tickers, start, end):
+    filters = []
+    if tickers is not None:
+        filters.append(('ticker', 'in', list(tickers)))
+    if start is not None:
+        filters.append(('date', '>=', pd.Timestamp(start)))
+    if end is not None:
+        filters.append(('date', '<=', pd.Timestamp(end)))
+    return filters or None
+
+
+def _load_csv(path, tickers, columns, start, end):
+    usecols = None if columns is None else ['ticker', 'date', *columns]
+    df = pd.read_csv(path, usecols=usecols)
+    df = to_store_types(df)
+    if tickers is not None:
+        df = df[df['ticker'].isin(list(tickers))]
+    if start is not None:
+        df = df[df['date'] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df['date'] <= pd.Timestamp(end)]
+    return df
+
+
+def default_source():
+    """The Parquet store, or data/processed_tech_stock_data.csv if the store has not been written yet"""
+    return STORE_DIR if os.path.isdir(STORE_DIR) or not os.path.exists(CSV_PATH) else CSV_PATH
+
+
+def load_prices(tickers=None, columns=None, start=None, end=None, path=None):
+    """Load processed price data as a typed frame sorted by ticker and date
+
+    Only the requested `columns` (plus ticker and date) are read, and the
+    ticker/date filters are pushed down to Parquet, so partitions of other
+    tickers are never opened. `path` defaults to the Parquet store, falling
+    back to data/processed_tech_stock_data.csv if the store has not been
+    written yet; a .csv `path` is read the same way.
+    """
+    path = path or default_source()
+    columns = list(columns) if columns is not None else None
+
+    if path.endswith('.csv'):
+        df = _load_csv(path, tickers, columns, start, end)
+    else:
+        read_columns = None if columns is None else ['ticker', 'date', *columns]
+        df = pd.read_parquet(path, columns=read_columns, filters=_filters(tickers, start, end))
+        df['ticker'] = df['ticker'].astype(str)
+
+    df = df.sort_values(['ticker', 'date'], kind='stable').reset_index(drop=True)
+    ordered = ['ticker', 'date'] + [c for c in df.columns if c not in ('ticker', 'date')]
+    return df[ordered]
+
+
+def load_ticker(ticker, columns=None, start=None, end=None, path=None):
+    """One ticker's rows, indexed 0..n-1 in date order"""
+    df = load_prices([ticker], columns, start, end, path)
+    return df.drop(columns='ticker')
+
+
+def data_mtime(ticker, store_dir=STORE_DIR):
+    """When `ticker`'s data last changed: its partition's mtime, else the CSV's (0 if neither exists)"""
+    path = ticker_path(ticker, store_dir)
+    if os.path.isdir(path):
+        return _store_mtime(path)
+    return os.path.getmtime(CSV_PATH) if os.path.exists(CSV_PATH) else 0.0
+
+
+# ---------------------------------------------------------------------------
+# Memory-mapped dates x tickers matrices
+# ---------------------------------------------------------------------------
+
+MATRIX_DIR = os.path.join(ROOT_DIR, 'data', 'matrix')
+MATRIX_ARRAYS = ('adj_close_price', 'close_price', 'volume', 'returns', 'present')
+
+
+def _store_mtime(store_dir=STORE_DIR):
+    mtimes = [os.path.getmtime(os.path.join(dirpath, name))
+              for dirpath, _, names in os.walk(store_dir) for name in names]
+    return max(mtimes, default=0.0)
+
+
+def _save_array(path, array):
+    # Write then rename, so readers never map a half-written file
+    tmp_path = path + '.tmp.npy'
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def _matrix_frames(path, columns):
+    """Yield (ticker, frame) for build_matrix_cache, one ticker in memory at a time
+
+    Store partitions are read one by one; a CSV has to be read whole.
+    """
+    if path.endswith('.csv'):
+        df = load_prices(columns=columns, path=path)
+        for ticker, frame in df.groupby('ticker', sort=True):
+            yield ticker, frame.drop(columns='ticker')
+        return
+    for ticker in list_tickers(path):
+        frame = pd.read_parquet(ticker_path(ticker, path), columns=['date', *columns])
+        yield ticker, frame.sort_values('date', kind='stable')
+
+
+def build_matrix_cache(cache_dir=MATRIX_DIR, path=None):
+    """Materialize aligned dates x tickers arrays from the store as .npy files
+
+    Writes adj_close_price, close_price (float64, NaN where a ticker has no
+    bar), volume (int64, 0 where missing), returns (each ticker's adj close
+    pct change over its own bars) and the `present` mask, plus dates.npy and
+    tickers.json giving the date -> row and ticker -> column index.
+
+    The arrays are written through memory maps one ticker column at a time
+    (a first pass collects the union of dates), so memory use does not grow
+    with the number of tickers when reading the Parquet store.
+    """
+    path = path or default_source()
+    columns = ['close_price', 'adj_close_price', 'volume']
+
+    tickers, dates = [], np.array([], dtype='datetime64[ns]')
+    for ticker, frame in _matrix_frames(path, []):
+        tickers.append(ticker)
+        dates = np.union1d(dates, frame['date'].to_numpy(dtype='datetime64[ns]'))
+    dates = pd.DatetimeIndex(dates)
+    shape = (len(dates), len(tickers))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # Written under temporary names then renamed, so readers never map a half-written file
+    dtypes = {'present': bool, 'adj_close_price': np.float64, 'close_price': np.float64,
+              'volume': np.int64, 'returns': np.float64}
+    arrays = {name: np.lib.format.open_memmap(os.path.join(cache_dir, f'{name}.tmp.npy'),
+                                              mode='w+', dtype=dtype, shape=shape)
+              for name, dtype in dtypes.items()}
+    for name in ('adj_close_price', 'close_price', 'returns'):
+        arrays[name][:] = np.nan
+    arrays['present'][:] = False
+    arrays['volume'][:] = 0
+
+    for j, (ticker, frame) in enumerate(_matrix_frames(path, columns)):
+        frame = frame.drop_duplicates('date', keep='first')
+        rows_j = dates.get_indexer(frame['date'])
+        arrays['present'][rows_j, j] = True
+        for column in ('adj_close_price', 'close_price'):
+            arrays[column][rows_j, j] = frame[column].to_numpy(dtype=float)
+        arrays['volume'][rows_j, j] = frame['volume'].to_numpy(dtype='int64')
+        prices = frame['adj_close_price'].to_numpy(dtype=float)
+        arrays['returns'][rows_j[1:], j] = prices[1:] / prices[:-1] - 1
+
+    for array in arrays.values():
+        array.flush()
+    arrays.clear()  # unmap before renaming
+    for name in dtypes:
+        os.replace(os.path.join(cache_dir, f'{name}.tmp.npy'), os.path.join(cache_dir, f'{name}.npy'))
+    _save_array(os.path.join(cache_dir, 'dates.npy'), dates.values.astype('datetime64[ns]'))
+    with open(os.path.join(cache_dir, 'tickers.json.tmp'), 'w') as f:
+        json.dump(tickers, f)
+    os.replace(os.path.join(cache_dir, 'tickers.json.tmp'), os.path.join(cache_dir, 'tickers.json'))
+
+    print(f"Matrix cache: {shape[0]} dates x {shape[1]} tickers written to {cache_dir}")
+    return MatrixCache(cache_dir)
+
+
+class MatrixCache:
+    """Read-only np.memmap views of the .npy files written by build_matrix_cache.
+
+    Every process that opens the same cache maps the same files, so the
+    pages are shared through the OS page cache instead of being copied.
+    """
+
+    def __init__(self, cache_dir=MATRIX_DIR):
+        self.cache_dir = cache_dir
+        self.dates = pd.DatetimeIndex(np.load(os.path.join(cache_dir, 'dates.npy')))
+        with open(os.path.join(cache_dir, 'tickers.json')) as f:
+            self.tickers = json.load(f)
+        self.ticker_index = {ticker: j for j, ticker in enumerate(self.tickers)}
+        self._arrays = {}
+
+    def __getitem__(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.cache_dir, f'{name}.npy'), mmap_mode='r')
+        return self._arrays[name]
+
+    def row(self, date):
+        return self.dates.get_loc(pd.Timestamp(date))
+
+    def series(self, ticker, name='close_price'):
+        """(dates, values) of one ticker over the rows where it has a bar"""
+        j = self.ticker_index[ticker]
+        rows = self['present'][:, j]
+        return self.dates[rows], np.asarray(self[name][rows, j])
+
+
+def open_matrix_cache(cache_dir=MATRIX_DIR, rebuild=True):
+    """Open the matrix cache, (re)building it first if it is missing or older than its source
+
+    The source is the store, or the CSV when the store has not been written yet.
+    """
+    built = os.path.join(cache_dir, 'tickers.json')
+    source = default_source()
+    if os.path.isdir(source):
+        source_mtime = _store_mtime(source)
+    else:
+        source_mtime = os.path.getmtime(source) if os.path.exists(source) else 0.0
+    stale = not os.path.exists(built) or os.path.getmtime(built) < source_mtime
+    if stale:
+        if not rebuild:
+            raise FileNotFoundError(f"Matrix cache in {cache_dir} is missing or stale")
+        return build_matrix_cache(cache_dir)
+    return MatrixCache(cache_dir)
+
+
+if __name__ == "__main__":
+    build_matrix_cache()
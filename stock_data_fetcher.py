@@ -1,20 +1,43 @@
-import yfinance as yf
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 from database_config import DatabaseConfig
+from stock_downloader import ConcurrentDownloader
+from symbol_cache import SymbolCache
+
+INSERT_STOCK_DATA = """
+INSERT IGNORE INTO stock_data 
+(stock_symbol, date, open_price, high_price, low_price, close_price, volume)
+VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+def history_to_rows(symbol, data):
+    """Convert a yfinance history frame into stock_data insert tuples (plain Python types)"""
+    if data.empty:
+        return []
+    return list(zip(
+        [symbol] * len(data),
+        data.index.date,
+        data['Open'].astype(float).tolist(),
+        data['High'].astype(float).tolist(),
+        data['Low'].astype(float).tolist(),
+        data['Close'].astype(float).tolist(),
+        data['Volume'].astype('int64').tolist()
+    ))
 
 class StockDataFetcher:
-    def __init__(self):
+    def __init__(self, batch_size=1000, downloader=None, symbol_cache=None):
         self.db_config = DatabaseConfig()
+        self.batch_size = batch_size
+        self.downloader = downloader or ConcurrentDownloader()
+        self.symbol_cache = symbol_cache or SymbolCache(self.db_config)
     
     def validate_stock(self, symbol):
-        """Validate if stock symbol exists in yfinance"""
-        try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            return 'symbol' in info or 'shortName' in info
-        except:
-            return False
+        """Validate if stock symbol exists (cached, see SymbolCache)"""
+        return self.symbol_cache.validate(symbol)
+    
+    def validate_stocks(self, symbols):
+        """{symbol: valid} for many symbols, with one remote lookup for the unknown ones"""
+        return self.symbol_cache.validate_many(symbols)
     
     def fetch_stock_data(self, symbols, start_date, end_date):
         """Fetch stock data for given symbols and date range"""
@@ -24,37 +47,106 @@ class StockDataFetcher:
         
         cursor = connection.cursor()
         
-        for symbol in symbols:
+        # Downloads run concurrently; rows are written here as each symbol completes
+        for result in self.downloader.download(symbols, start=start_date, end=end_date):
+            symbol = result.symbol
+            if not result.ok:
+                print(f"Error fetching data for {symbol}: {result.error}")
+                continue
             try:
-                ticker = yf.Ticker(symbol)
-                data = ticker.history(start=start_date, end=end_date)
-                
-                for date, row in data.iterrows():
-                    insert_query = """
-                    INSERT IGNORE INTO stock_data 
-                    (stock_symbol, date, open_price, high_price, low_price, close_price, volume)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """
-                    cursor.execute(insert_query, (
-                        symbol,
-                        date.date(),
-                        float(row['Open']),
-                        float(row['High']),
-                        float(row['Low']),
-                        float(row['Close']),
-                        int(row['Volume'])
-                    ))
+                rows = history_to_rows(symbol, result.data)
+                self.insert_rows(connection, cursor, rows)
                 
-                print(f"Data fetched for {symbol}")
+                print(f"Data fetched for {symbol} ({len(rows)} rows, {result.seconds:.2f}s)")
                 
             except Exception as e:
                 print(f"Error fetching data for {symbol}: {e}")
         
-        connection.commit()
         cursor.close()
         connection.close()
         return True
     
+    def insert_rows(self, connection, cursor, rows):
+        """Insert stock_data rows with executemany, committing every batch_size rows
+        
+        Committed batches survive a later failure; a failing batch is rolled
+        back and the error re-raised. Returns the number of rows inserted
+        (duplicates ignored by INSERT IGNORE are not counted).
+        """
+        inserted = 0
+        for start in range(0, len(rows), self.batch_size):
+            try:
+                cursor.executemany(INSERT_STOCK_DATA, rows[start:start + self.batch_size])
+                connection.commit()
+                inserted += max(cursor.rowcount, 0)
+            except Exception:
+                connection.rollback()
+                raise
+        return inserted
+    
+    def latest_dates(self, cursor, symbols=None):
+        """Return {symbol: last stored date}; all symbols in stock_data if none given"""
+        if symbols:
+            placeholders = ', '.join(['%s'] * len(symbols))
+            cursor.execute(f"""
+                SELECT stock_symbol, MAX(date) FROM stock_data
+                WHERE stock_symbol IN ({placeholders})
+                GROUP BY stock_symbol
+            """, tuple(symbols))
+        else:
+            cursor.execute("SELECT stock_symbol, MAX(date) FROM stock_data GROUP BY stock_symbol")
+        return dict(cursor.fetchall())
+    
+    def fetch_incremental(self, symbols=None, default_start=None):
+        """Fetch only the dates after each symbol's latest stored row, up to today
+        
+        Symbols with no stored rows start at default_start (skipped if it is
+        None). Returns {symbol: rows added}.
+        """
+        connection = self.db_config.get_connection()
+        if not connection:
+            return None
+        
+        cursor = connection.cursor()
+        added = {}
+        try:
+            latest = self.latest_dates(cursor, symbols)
+            today = date.today()
+            
+            requests = {}
+            for symbol in symbols or sorted(latest):
+                if symbol in latest:
+                    start = latest[symbol] + timedelta(days=1)
+                elif default_start:
+                    start = default_start.date() if isinstance(default_start, datetime) else default_start
+                else:
+                    print(f"{symbol}: no stored data and no start date, skipping")
+                    continue
+                if start > today:
+                    added[symbol] = 0
+                    continue
+                # yfinance's end date is exclusive
+                requests[symbol] = {'start': start, 'end': today + timedelta(days=1)}
+            
+            print(f"Updating {len(requests)} symbols ({len(added)} already up to date)...")
+            for result in self.downloader.download_each(requests):
+                symbol = result.symbol
+                if not result.ok:
+                    print(f"Error fetching data for {symbol}: {result.error}")
+                    continue
+                try:
+                    rows = history_to_rows(symbol, result.data)
+                    added[symbol] = self.insert_rows(connection, cursor, rows)
+                    print(f"{symbol}: +{added[symbol]} rows since {requests[symbol]['start']}")
+                except Exception as e:
+                    print(f"Error fetching data for {symbol}: {e}")
+        finally:
+            cursor.close()
+            connection.close()
+        
+        print(f"Added {sum(added.values())} rows across {len(added)} symbols")
+        return added
+    
     def populate_sample_data(self):
         """Populate database with sample stock data"""
         # Sample tech stocks (change as needed)
@@ -96,10 +188,24 @@ def main():
             except ValueError:
                 print("Invalid date format. Please use YYYY-MM-DD.")
         
+        elif action == "update" and len(sys.argv) in (2, 3, 4):
+            # Incremental: only dates after each symbol's latest stored row
+            symbols = None
+            if len(sys.argv) >= 3 and sys.argv[2] != "all":
+                symbols = [s.strip().upper() for s in sys.argv[2].split(',')]
+            try:
+                default_start = datetime.strptime(sys.argv[3], '%Y-%m-%d').date() if len(sys.argv) == 4 else None
+            except ValueError:
+                print("Invalid date format. Please use YYYY-MM-DD.")
+                return
+            if fetcher.fetch_incremental(symbols, default_start) is None:
+                print("Failed to update data.")
+        
         else:
             print("Usage:")
             print("  python3 stock_data_fetcher.py sample")
             print("  python3 stock_data_fetcher.py fetch <symbols> <start_date> <end_date>")
+            print("  python3 stock_data_fetcher.py update [<symbols>|all] [<start_date for new symbols>]")
             print("  Example: python3 stock_data_fetcher.py fetch AAPL,MSFT 2024-01-01 2024-12-01")
         return
     
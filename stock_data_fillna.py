@@ -1,4 +1,6 @@
 import pandas as pd 
+import argparse
+from datetime import datetime, timedelta
 import mysql.connector
 from mysql.connector import Error
 import warnings
@@ -30,7 +32,7 @@ def fill_data(method):
                 missing_dates = full_range.difference(group['date'])
                 missing_dates = [date.date() for date in missing_dates]
 
-                print(f'Missing dates for {stock_symbol}: {[d.strftime('%Y-%m-%d') for d in missing_dates]}')
+                print(f'Missing dates for {stock_symbol}: {[d.strftime("%Y-%m-%d") for d in missing_dates]}')
                 
                 for date in missing_dates:
                     missing.append({
@@ -98,13 +100,146 @@ def fill_data(method):
         if connection.is_connected():
             connection.close()
 
+PRICE_COLUMNS = ['open_price', 'high_price', 'low_price', 'close_price', 'volume']
+
+# One row per gap: each row whose previous stored date for the same symbol is
+# more than a day earlier, together with that previous row's values
+GAP_QUERY = '''
+    SELECT stock_symbol, prev_date, date,
+           prev_open_price, prev_high_price, prev_low_price, prev_close_price, prev_volume,
+           open_price, high_price, low_price, close_price, volume
+    FROM (
+        SELECT stock_symbol, date, open_price, high_price, low_price, close_price, volume,
+               LAG(date) OVER w AS prev_date,
+               LAG(open_price) OVER w AS prev_open_price,
+               LAG(high_price) OVER w AS prev_high_price,
+               LAG(low_price) OVER w AS prev_low_price,
+               LAG(close_price) OVER w AS prev_close_price,
+               LAG(volume) OVER w AS prev_volume
+        FROM stock_data
+        {symbol_filter}
+        WINDOW w AS (PARTITION BY stock_symbol ORDER BY date)
+    ) AS rows_with_prev
+    WHERE DATEDIFF(date, prev_date) > 1 {window_filter}
+    ORDER BY stock_symbol, date
+'''
+
+def _to_float(value):
+    return None if value is None else float(value)
+
+def gap_fill_rows(gap, method, start_date=None, end_date=None):
+    """Missing rows for one gap, filled from the stored rows on either side
+    
+    Interpolation is linear in the day offset, which matches pandas'
+    interpolate() over the daily-reindexed frame used by fill_data.
+    """
+    symbol, prev_date, next_date = gap[:3]
+    prev_values = [_to_float(v) for v in gap[3:8]]
+    next_values = [_to_float(v) for v in gap[8:13]]
+    span = (next_date - prev_date).days
+    
+    rows = []
+    for k in range(1, span):
+        date = prev_date + timedelta(days=k)
+        if (start_date and date < start_date) or (end_date and date > end_date):
+            continue
+        
+        values = []
+        for prev, nxt in zip(prev_values, next_values):
+            if method == 1:  # Interpolation
+                value = None if prev is None or nxt is None else prev + (nxt - prev) * k / span
+            elif method == 2:  # Backward filling
+                value = nxt
+            else:  # Forward filling
+                value = prev
+            values.append(value)
+        if values[-1] is not None:
+            values[-1] = int(round(values[-1]))  # volume is BIGINT
+        rows.append((symbol, date, *values))
+    return rows
+
+def fill_data_in_place(method, symbols=None, start_date=None, end_date=None, batch_size=1000):
+    '''Insert only the missing (symbol, date) rows, leaving stored rows untouched
+    
+    Gaps are found in SQL with LAG() over the unique_stock_date key, so only
+    the rows bounding each gap are read, and the filled rows are written with
+    batched executemany. Optionally restricted to some symbols and to
+    missing dates within [start_date, end_date].
+    '''
+    connection = None
+    try:
+        connection = mysql.connector.connect(
+            host='localhost',
+            user='admin',  # Change as needed
+            password='password',   # Change as needed
+            database='stock_portfolio' # Database name
+        )
+        cursor = connection.cursor()
+        
+        params = []
+        symbol_filter = ''
+        if symbols:
+            symbol_filter = f"WHERE stock_symbol IN ({', '.join(['%s'] * len(symbols))})"
+            params.extend(symbols)
+        window_filter = ''
+        if start_date:
+            window_filter += ' AND date > %s'
+            params.append(start_date)
+        if end_date:
+            window_filter += ' AND prev_date < %s'
+            params.append(end_date)
+        
+        cursor.execute(GAP_QUERY.format(symbol_filter=symbol_filter, window_filter=window_filter),
+                       tuple(params))
+        gaps = cursor.fetchall()
+        
+        rows = []
+        for gap in gaps:
+            rows.extend(gap_fill_rows(gap, method, start_date, end_date))
+        
+        inserted = 0
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany('''
+                INSERT IGNORE INTO stock_data 
+                (stock_symbol, date, open_price, high_price, low_price, close_price, volume)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ''', rows[start:start + batch_size])
+            connection.commit()
+            inserted += max(cursor.rowcount, 0)
+        
+        print(f'Found {len(gaps)} gaps, inserted {inserted} missing rows')
+        cursor.close()
+        return inserted
+    
+    except Error as e:
+        print(f'Error: {e}')
+        return None
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
 if __name__ == "__main__":
-    print('Filling missing data using:')
-    print('1. Interpolation')
-    print('2. Backward filling')
-    print('3. Forward filling')
+    parser = argparse.ArgumentParser(description='Fill missing dates in stock_data')
+    parser.add_argument('method', nargs='?', type=int, choices=[1, 2, 3],
+                        help='1 = interpolation, 2 = backward filling, 3 = forward filling')
+    parser.add_argument('--in-place', action='store_true',
+                        help='only insert the missing rows instead of rebuilding the table')
+    parser.add_argument('--symbols', help='comma-separated symbols (in-place mode only)')
+    parser.add_argument('--start', type=parse_date, help='first missing date to fill, YYYY-MM-DD (in-place mode only)')
+    parser.add_argument('--end', type=parse_date, help='last missing date to fill, YYYY-MM-DD (in-place mode only)')
+    args = parser.parse_args()
     
-    choice = int(input('Choose option (1, 2, or 3): ').strip())
+    choice = args.method
+    if choice is None:
+        print('Filling missing data using:')
+        print('1. Interpolation')
+        print('2. Backward filling')
+        print('3. Forward filling')
+        
+        choice = int(input('Choose option (1, 2, or 3): ').strip())
 
     choice_dict = {1:'interpolation', 2:'backward filling', 3:'forward filling'}
     
@@ -112,4 +247,8 @@ if __name__ == "__main__":
         print('\nInvalid input!')
         quit()
     
-    df = fill_data(choice)
\ No newline at end of file
+    if args.in_place:
+        symbols = [s.strip().upper() for s in args.symbols.split(',')] if args.symbols else None
+        fill_data_in_place(choice, symbols, args.start, args.end)
+    else:
+        df = fill_data(choice)
\ No newline at end of file
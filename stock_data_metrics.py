@@ -1,3 +1,4 @@
+import sys
 import pandas as pd
 import mysql.connector
 from mysql.connector import Error
@@ -6,6 +7,32 @@ import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 warnings.filterwarnings("ignore", category=FutureWarning)
 
+CREATE_METRICS_TABLE = '''
+CREATE TABLE IF NOT EXISTS stock_metrics (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    stock_symbol VARCHAR(10) NOT NULL,
+    date DATE NOT NULL,
+    close_price DECIMAL(10,2),
+    daily_return DECIMAL(10,6),
+    cumulative_return DECIMAL(10,6),
+    volatility DECIMAL(10,6),
+    UNIQUE KEY unique_stock_date (stock_symbol, date)
+);
+'''
+
+UPSERT_METRICS = '''
+    INSERT INTO stock_metrics 
+    (stock_symbol, date, close_price, daily_return, cumulative_return, volatility)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        close_price = VALUES(close_price),
+        daily_return = VALUES(daily_return),
+        cumulative_return = VALUES(cumulative_return),
+        volatility = VALUES(volatility)
+'''
+
+VOLATILITY_WINDOW = 30
+
 def format_metrics():
     """Calculate metrics and store them into stock_metrics table"""
     try:
@@ -48,18 +75,7 @@ def format_metrics():
 
         # sql
         cursor.execute('DROP TABLE IF EXISTS stock_metrics')
-        cursor.execute('''
-        CREATE TABLE stock_metrics (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            stock_symbol VARCHAR(10) NOT NULL,
-            date DATE NOT NULL,
-            close_price DECIMAL(10,2),
-            daily_return DECIMAL(10,6),
-            cumulative_return DECIMAL(10,6),
-            volatility DECIMAL(10,6),
-            UNIQUE KEY unique_stock_date (stock_symbol, date)
-        );
-        ''')
+        cursor.execute(CREATE_METRICS_TABLE)
 
         # write data
         for _, row in df_metrics.iterrows():
@@ -91,6 +107,117 @@ def format_metrics():
             connection.close()
 
 
+def compute_new_metrics(state, new):
+    """Metrics for the `new` rows, continuing from the stored `state` rows
+    
+    `state` holds the last VOLATILITY_WINDOW stored metric rows (date,
+    close_price, daily_return, cumulative_return), oldest first, and may be
+    empty for a new symbol; `new` holds the stock_data rows after it. The
+    result matches recomputing the whole history, up to the rounding of the
+    stored DECIMAL values.
+    """
+    n_state = len(state)
+    closes = pd.concat([state['close_price'], new['close_price']], ignore_index=True).astype(float)
+    
+    returns = closes.pct_change()
+    if n_state:
+        returns.iloc[:n_state] = state['daily_return'].astype(float).values
+    
+    base = 1.0
+    if n_state and not pd.isna(state['cumulative_return'].iloc[-1]):
+        base += float(state['cumulative_return'].iloc[-1])
+    
+    metrics = new[['date', 'close_price']].reset_index(drop=True)
+    metrics['daily_return'] = returns.iloc[n_state:].values
+    metrics['cumulative_return'] = base * (1 + metrics['daily_return']).cumprod() - 1
+    metrics['volatility'] = returns.rolling(window=VOLATILITY_WINDOW).std().iloc[n_state:].values
+    return metrics
+
+def update_metrics(symbols=None, batch_size=1000):
+    """Incrementally extend stock_metrics with stock_data rows newer than each symbol's latest metric
+    
+    Per symbol this reads the last VOLATILITY_WINDOW metric rows as state plus
+    the new stock_data rows, and upserts only the new metrics in batches, so a
+    daily refresh costs O(new rows) rather than O(history). Rows inserted
+    into stock_data before a symbol's latest metric date (e.g. back-filled
+    gaps) are not picked up; use format_metrics() to rebuild for those.
+    """
+    connection = None
+    try:
+        connection = mysql.connector.connect(
+            host='localhost',
+            user='admin',
+            password='password',
+            database='stock_portfolio'
+        )
+        cursor = connection.cursor()
+        cursor.execute(CREATE_METRICS_TABLE)
+        
+        # New stock_data rows: everything after each symbol's latest metric date
+        query = '''
+            SELECT d.stock_symbol, d.date, d.close_price
+            FROM stock_data d
+            LEFT JOIN (
+                SELECT stock_symbol, MAX(date) AS last_date
+                FROM stock_metrics
+                GROUP BY stock_symbol
+            ) m ON m.stock_symbol = d.stock_symbol
+            WHERE (m.last_date IS NULL OR d.date > m.last_date)
+        '''
+        params = []
+        if symbols:
+            query += f" AND d.stock_symbol IN ({', '.join(['%s'] * len(symbols))})"
+            params.extend(symbols)
+        query += ' ORDER BY d.stock_symbol, d.date'
+        cursor.execute(query, tuple(params))
+        new_data = pd.DataFrame(cursor.fetchall(), columns=['stock_symbol', 'date', 'close_price'])
+        
+        if new_data.empty:
+            print('Metrics are up to date.')
+            return 0
+        
+        rows = []
+        for stock_symbol, new in new_data.groupby('stock_symbol', sort=False):
+            cursor.execute('''
+                SELECT date, close_price, daily_return, cumulative_return
+                FROM stock_metrics
+                WHERE stock_symbol = %s
+                ORDER BY date DESC
+                LIMIT %s
+            ''', (stock_symbol, VOLATILITY_WINDOW))
+            state = pd.DataFrame(cursor.fetchall()[::-1],
+                                 columns=['date', 'close_price', 'daily_return', 'cumulative_return'])
+            
+            metrics = compute_new_metrics(state, new)
+            for row in metrics.itertuples(index=False):
+                rows.append((
+                    stock_symbol,
+                    row.date,
+                    None if pd.isna(row.close_price) else float(row.close_price),
+                    None if pd.isna(row.daily_return) else float(row.daily_return),
+                    None if pd.isna(row.cumulative_return) else float(row.cumulative_return),
+                    None if pd.isna(row.volatility) else float(row.volatility)
+                ))
+            print(f'{stock_symbol}: {len(metrics)} new rows')
+        
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(UPSERT_METRICS, rows[start:start + batch_size])
+            connection.commit()
+        
+        print(f'\nUpserted {len(rows)} metric rows for {new_data["stock_symbol"].nunique()} symbols')
+        cursor.close()
+        return len(rows)
+    
+    except Error as e:
+        print(f'Error: {e}')
+        if connection and connection.is_connected():
+            connection.rollback()
+        return None
+    finally:
+        if connection and connection.is_connected():
+            connection.close()
+
+
 def query_metrics():
     """Ask user for stock, time slot, and metric; compute values instead of listing raw rows"""
     connection = None
@@ -174,5 +301,11 @@ def query_metrics():
             connection.close()
 
 if __name__ == "__main__":
-    format_metrics()
-    query_metrics()
+    if len(sys.argv) > 1 and sys.argv[1] == "update":
+        symbols = None
+        if len(sys.argv) > 2 and sys.argv[2] != "all":
+            symbols = [s.strip().upper() for s in sys.argv[2].split(',')]
+        update_metrics(symbols)
+    else:
+        format_metrics()
+        query_metrics()
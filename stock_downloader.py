@@ -0,0 +1,100 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import yfinance as yf
+
+
+class YFinanceSource:
+    """Default data source: yfinance Ticker.history"""
+
+    def history(self, symbol, **kwargs):
+        return yf.Ticker(symbol).history(**kwargs)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: at most `rate` requests per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class DownloadResult:
+    """Outcome of downloading one symbol"""
+
+    def __init__(self, symbol, data=None, error=None, seconds=0.0, attempts=0):
+        self.symbol = symbol
+        self.data = data
+        self.error = error
+        self.seconds = seconds
+        self.attempts = attempts
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class ConcurrentDownloader:
+    """Downloads many symbols on a bounded thread pool.
+
+    Every request (including retries) takes a token from a shared bucket, so
+    `rate` caps requests per second across all workers. Failed requests, and
+    requests that return no rows (how yfinance usually reports rate limits),
+    are retried with exponential backoff. `source` is anything with a
+    history(symbol, **kwargs) method returning a DataFrame, so tests can
+    plug in a local fake instead of yfinance.
+    """
+
+    def __init__(self, source=None, max_workers=8, rate=5.0, burst=None,
+                 retries=3, backoff=1.0):
+        self.source = source or YFinanceSource()
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.retries = retries
+        self.backoff = backoff
+
+    def _download(self, symbol, kwargs):
+        start = time.perf_counter()
+        error = None
+        for attempt in range(1, self.retries + 2):
+            if self.bucket:
+                self.bucket.acquire()
+            try:
+                data = self.source.history(symbol, **kwargs)
+                if data is not None and not data.empty:
+                    return DownloadResult(symbol, data, None, time.perf_counter() - start, attempt)
+                # yfinance reports rate limits and transient errors as an empty frame
+                error = ValueError("No data returned")
+            except Exception as e:
+                error = e
+            if attempt <= self.retries:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+        return DownloadResult(symbol, None, error, time.perf_counter() - start, self.retries + 1)
+
+    def download(self, symbols, **history_kwargs):
+        """Yield a DownloadResult per symbol as soon as each one completes"""
+        return self.download_each({symbol: history_kwargs for symbol in symbols})
+
+    def download_each(self, requests):
+        """Like download, with per-symbol history kwargs ({symbol: kwargs})"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self._download, symbol, kwargs) for symbol, kwargs in requests.items()]
+            for future in as_completed(futures):
+                yield future.result()
@@ -0,0 +1,193 @@
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from mysql.connector import Error
+
+CREATE_SYMBOL_METADATA = """
+CREATE TABLE IF NOT EXISTS symbol_metadata (
+    stock_symbol VARCHAR(10) PRIMARY KEY,
+    is_valid BOOLEAN NOT NULL,
+    checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+)
+"""
+
+UPSERT_SYMBOL_METADATA = """
+INSERT INTO symbol_metadata (stock_symbol, is_valid, checked_at)
+VALUES (%s, %s, CURRENT_TIMESTAMP)
+ON DUPLICATE KEY UPDATE is_valid = VALUES(is_valid), checked_at = CURRENT_TIMESTAMP
+"""
+
+
+# yfinance error messages that mean the symbol has no data, not that the request failed
+INVALID_SYMBOL_ERRORS = ('delisted', 'not found', 'no data found', 'no price data', 'no timezone found')
+
+
+def yfinance_lookup(symbols):
+    """{symbol: valid} for many symbols with a single yfinance download
+
+    A symbol is valid if it has any recent price history. yf.download does
+    not raise on network or HTTP errors; it logs them in yf.shared._ERRORS
+    and returns NaN prices. Raise then, or if no frame came back at all,
+    so nothing gets cached for a failed request.
+    """
+    import yfinance as yf
+
+    symbols = list(symbols)
+    data = yf.download(symbols, period='5d', group_by='ticker',
+                       auto_adjust=False, progress=False, threads=True)
+    errors = getattr(getattr(yf, 'shared', None), '_ERRORS', None) or {}
+    failed = {symbol: str(errors[symbol]) for symbol in symbols if symbol in errors
+              and not any(marker in str(errors[symbol]).lower() for marker in INVALID_SYMBOL_ERRORS)}
+    if failed:
+        raise RuntimeError(f"yfinance download failed: {failed}")
+    if len(data.columns) == 0:
+        raise RuntimeError(f"yfinance returned nothing for {', '.join(symbols)}")
+
+    if isinstance(data.columns, pd.MultiIndex):
+        downloaded = set(data.columns.get_level_values(0))
+        return {symbol: symbol in downloaded and bool(data[symbol]['Close'].notna().any())
+                for symbol in symbols}
+    # Older yfinance versions return flat columns for a single symbol
+    if len(symbols) == 1 and 'Close' in data:
+        return {symbols[0]: bool(data['Close'].notna().any())}
+    return {}
+
+
+class SymbolCache:
+    """Answers "is this a real ticker?" without a remote call for known symbols.
+
+    Lookups go, in order, through an in-process LRU, the symbols already in
+    stock_data, and the symbol_metadata table; only the symbols none of
+    those can answer are looked up remotely, in one batched request. Valid
+    results are trusted for `ttl` seconds and invalid ones for the shorter
+    `negative_ttl`, both in the LRU and in symbol_metadata.
+    """
+
+    def __init__(self, db_config, lookup=yfinance_lookup, ttl=7 * 24 * 3600,
+                 negative_ttl=24 * 3600, lru_size=4096):
+        self.db_config = db_config
+        self.lookup = lookup
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lru_size = lru_size
+        self._lru = OrderedDict()  # symbol -> (valid, expires_at)
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self.lru_hits = 0
+        self.db_hits = 0
+        self.remote_lookups = 0
+
+    def _remember(self, symbol, valid):
+        expires_at = time.monotonic() + (self.ttl if valid else self.negative_ttl)
+        with self._lock:
+            self._lru[symbol] = (valid, expires_at)
+            self._lru.move_to_end(symbol)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def _from_lru(self, symbol):
+        with self._lock:
+            entry = self._lru.get(symbol)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._lru[symbol]
+                return None
+            self._lru.move_to_end(symbol)
+            self.lru_hits += 1
+            return entry[0]
+
+    def _from_database(self, cursor, symbols):
+        """{symbol: valid} for symbols in stock_data or with a fresh symbol_metadata row"""
+        placeholders = ', '.join(['%s'] * len(symbols))
+        cursor.execute(f"SELECT DISTINCT stock_symbol FROM stock_data WHERE stock_symbol IN ({placeholders})",
+                       tuple(symbols))
+        known = {row[0]: True for row in cursor.fetchall()}
+
+        remaining = [s for s in symbols if s not in known]
+        if remaining:
+            try:
+                if not self._table_ready:
+                    cursor.execute(CREATE_SYMBOL_METADATA)
+                    self._table_ready = True
+                placeholders = ', '.join(['%s'] * len(remaining))
+                cursor.execute(f"""
+                    SELECT stock_symbol, is_valid FROM symbol_metadata
+                    WHERE stock_symbol IN ({placeholders})
+                      AND checked_at > NOW() - INTERVAL IF(is_valid, %s, %s) SECOND
+                """, (*remaining, self.ttl, self.negative_ttl))
+                known.update({row[0]: bool(row[1]) for row in cursor.fetchall()})
+            except Error as e:
+                # Keep the stock_data hits; the rest fall through to the remote lookup
+                print(f"Symbol metadata unavailable: {e}")
+        return known
+
+    def validate_many(self, symbols):
+        """{symbol: valid} for upper-cased `symbols`"""
+        symbols = list(dict.fromkeys(s.strip().upper() for s in symbols))
+        result = {}
+        pending = []
+        for symbol in symbols:
+            valid = self._from_lru(symbol)
+            if valid is None:
+                pending.append(symbol)
+            else:
+                result[symbol] = valid
+        if not pending:
+            return result
+
+        connection = self.db_config.get_connection()
+        cursor = connection.cursor() if connection else None
+        try:
+            if cursor:
+                try:
+                    found = self._from_database(cursor, pending)
+                except Error as e:
+                    print(f"Symbol cache unavailable: {e}")
+                    found = {}
+                self.db_hits += len(found)
+                for symbol, valid in found.items():
+                    self._remember(symbol, valid)
+                result.update(found)
+                pending = [s for s in pending if s not in found]
+
+            if pending:
+                self.remote_lookups += len(pending)
+                try:
+                    looked_up = self.lookup(pending)
+                except Exception as e:
+                    # Do not cache anything for a failed request
+                    print(f"Symbol lookup failed: {e}")
+                    result.update({symbol: False for symbol in pending})
+                    return result
+
+                for symbol in pending:
+                    valid = bool(looked_up.get(symbol, False))
+                    result[symbol] = valid
+                    self._remember(symbol, valid)
+                if cursor:
+                    try:
+                        cursor.executemany(UPSERT_SYMBOL_METADATA,
+                                           [(symbol, result[symbol]) for symbol in pending])
+                        connection.commit()
+                    except Error as e:
+                        print(f"Could not store symbol metadata: {e}")
+            return result
+        finally:
+            if cursor:
+                cursor.close()
+                connection.close()
+
+    def validate(self, symbol):
+        return self.validate_many([symbol])[symbol.strip().upper()]
+
+    def stats(self):
+        return {
+            'lru_hits': self.lru_hits,
+            'db_hits': self.db_hits,
+            'remote_lookups': self.remote_lookups,
+            'lru_size': len(self._lru),
+        }
@@ -0,0 +1,132 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from algorithms.backtest import (ArimaVoteSignal, RotationRule, build_price_matrix,
+                                 run_backtest)
+
+
+def price_frame(seed=0, n_dates=150, tickers=('MSFT', 'AAPL', 'NVDA', 'AMD')):
+    """Random-walk prices for a few tickers, with about 5% of bars missing"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2020-01-01', periods=n_dates)
+    frames = []
+    for k, ticker in enumerate(tickers):
+        prices = (20 + 40 * k) * np.exp(np.cumsum(rng.normal(0, 0.03, n_dates)))
+        keep = rng.random(n_dates) > 0.05
+        frames.append(pd.DataFrame({'ticker': ticker, 'date': dates[keep],
+                                    'adj_close_price': prices[keep]}))
+    return pd.concat(frames, ignore_index=True).sort_values(['date', 'ticker'], kind='stable')
+
+
+def reference_backtest(df, forecasts, capital=100000):
+    """The per-day, per-ticker pandas loop the vectorized engine replaced.
+
+    Same votes and sizing as ArimaVoteSignal + RotationRule, with the ARIMA
+    vote taken as the change from the day's price to the forecast price.
+    """
+    tickers = df['ticker'].unique()
+    all_dates = sorted(df['date'].unique())
+    train_size = int(len(all_dates) * 0.8)
+    dates = all_dates[train_size:]
+    positions = {}
+    portfolio_values = []
+    trade_count = 0
+
+    first_day_data = df[df['date'] == dates[0]]
+    for ticker in tickers:
+        ticker_data = first_day_data[first_day_data['ticker'] == ticker]
+        if not ticker_data.empty:
+            price = ticker_data['adj_close_price'].iloc[0]
+            shares = int(capital * 0.03 / price)
+            if shares > 0 and capital > shares * price:
+                capital -= shares * price
+                positions[ticker] = shares
+
+    for date in dates:
+        day_data = df[df['date'] == date]
+        current_prices = {}
+        for ticker in tickers:
+            ticker_data = day_data[day_data['ticker'] == ticker]
+            if ticker_data.empty:
+                continue
+            price = ticker_data['adj_close_price'].iloc[0]
+            current_prices[ticker] = price
+            hist_data = df[(df['ticker'] == ticker) & (df['date'] <= all_dates[train_size - 1])]
+            if len(hist_data) <= 50 or ticker not in forecasts:
+                continue
+
+            signals = []
+            change_pct = (forecasts[ticker] - price) / price
+            signals.append('BUY' if change_pct > 0.0001 else 'SELL' if change_pct < -0.0001 else 'HOLD')
+
+            prices = hist_data['adj_close_price'].tail(20)
+            bb_upper = prices.mean() + 2 * prices.std()
+            bb_lower = prices.mean() - 2 * prices.std()
+            signals.append('BUY' if price <= bb_lower else 'SELL' if price >= bb_upper else 'HOLD')
+
+            price_changes = hist_data['adj_close_price'].pct_change().tail(14)
+            gains = price_changes[price_changes > 0]
+            losses = -price_changes[price_changes < 0]
+            avg_gain = gains.mean() if len(gains) > 0 else 0
+            avg_loss = losses.mean() if len(losses) > 0 else 0
+            if avg_loss > 0:
+                rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+                signals.append('BUY' if rsi < 30 else 'SELL' if rsi > 70 else 'HOLD')
+
+            buy_votes = signals.count('BUY')
+            sell_votes = signals.count('SELL')
+            signal = 'BUY' if buy_votes > sell_votes else 'SELL' if sell_votes > buy_votes else 'HOLD'
+
+            if signal == 'BUY':
+                if capital < price * 10:
+                    worst_ticker = None
+                    worst_return = float('inf')
+                    for t in positions:
+                        if positions[t] > 0 and t != ticker and current_prices.get(t, 0) > 0:
+                            perf = current_prices[t] / price
+                            if perf < worst_return:
+                                worst_return = perf
+                                worst_ticker = t
+                    if worst_ticker:
+                        capital += positions[worst_ticker] * current_prices[worst_ticker]
+                        positions[worst_ticker] = 0
+                        trade_count += 1
+                if capital > price * 10:
+                    shares = int(capital * 0.1 / price)
+                    if shares > 0:
+                        capital -= shares * price
+                        positions[ticker] = positions.get(ticker, 0) + shares
+                        trade_count += 1
+            elif signal == 'SELL' and positions.get(ticker, 0) > 0:
+                shares = positions[ticker] // 2
+                if shares > 0:
+                    capital += shares * price
+                    positions[ticker] -= shares
+                    trade_count += 1
+
+        stock_value = sum(positions.get(t, 0) * current_prices.get(t, 0) for t in tickers)
+        portfolio_values.append(capital + stock_value)
+    return portfolio_values, trade_count
+
+
+def test_engine_matches_reference_loop():
+    for seed in range(3):
+        df = price_frame(seed)
+        matrix = build_price_matrix(df)
+        train_size = int(len(matrix.dates) * 0.8)
+        # Frozen forecasts close to the last training price, so votes flip during the test period
+        forecasts = {ticker: matrix.history(train_size - 1, j)[-1] * 1.02
+                     for j, ticker in enumerate(matrix.tickers) if ticker != 'AMD'}
+
+        result = run_backtest(matrix, train_size,
+                              {'vote': ArimaVoteSignal(forecasts, train_size)},
+                              RotationRule(verbose=False))
+        values, trade_count = reference_backtest(df, forecasts)
+
+        np.testing.assert_allclose(result.values, values, rtol=1e-12)
+        assert result.portfolio.trade_count == trade_count
+        assert trade_count > 0
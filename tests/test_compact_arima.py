@@ -0,0 +1,70 @@
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from statsmodels.tsa.arima.model import ARIMA
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from algorithms.ARIMA.compact_arima import CompactARIMA
+
+warnings.filterwarnings('ignore')
+
+
+def log_returns(n, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range('2020-01-01', periods=n, freq='B')
+    return pd.Series(0.0005 + rng.normal(0, 0.01, n), index=index)
+
+
+@pytest.fixture(params=[(1, 0, 1), (2, 1, 2)])
+def fitted(request):
+    returns = log_returns(180)
+    results = ARIMA(returns[:150], order=request.param).fit()
+    return results, returns[150:]
+
+
+def test_forecast_matches_statsmodels(fitted):
+    results, _ = fitted
+    compact = CompactARIMA.from_results(results, 'log_diff')
+
+    expected = results.forecast(steps=5)
+    forecast = compact.forecast(steps=5)
+    np.testing.assert_allclose(forecast.to_numpy(), expected.to_numpy(), rtol=1e-10, atol=1e-12)
+    assert list(forecast.index) == list(expected.index)
+
+
+def test_append_matches_statsmodels_append_without_refit(fitted):
+    results, new = fitted
+    compact = CompactARIMA.from_results(results, 'log_diff')
+
+    expected = results.append(new, refit=False).forecast(steps=5)
+    forecast = compact.append(new).forecast(steps=5)
+    np.testing.assert_allclose(forecast.to_numpy(), expected.to_numpy(), rtol=1e-8, atol=1e-10)
+    assert compact.last_date == new.index[-1]
+    assert compact.nobs == 180
+
+
+def test_save_load_round_trip(fitted, tmp_path):
+    results, new = fitted
+    compact = CompactARIMA.from_results(results, 'log_diff')
+    path = str(tmp_path / 'model.npz')
+    compact.save(path)
+    loaded = CompactARIMA.load(path)
+
+    assert loaded.order == compact.order and loaded.transform == 'log_diff'
+    np.testing.assert_array_equal(loaded.forecast(steps=3), compact.forecast(steps=3))
+    np.testing.assert_allclose(loaded.append(new).forecast(steps=3),
+                               compact.append(new).forecast(steps=3))
+
+
+def test_prices_round_trip_through_log_returns(fitted):
+    results, new = fitted
+    compact = CompactARIMA.from_results(results, 'log_diff')
+    prices = 100 * np.exp(np.cumsum(new.to_numpy()))
+
+    compact.append_prices(prices, 100.0)
+    expected = results.append(new, refit=False).forecast(steps=1).iloc[0]
+    assert compact.forecast_price(prices[-1]) == pytest.approx(prices[-1] * np.exp(expected), rel=1e-10)
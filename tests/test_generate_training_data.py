@@ -0,0 +1,89 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from generate_training_data import calculate_metrics, fill_missing_data
+
+PRICE_COLUMNS = ['open_price', 'high_price', 'low_price', 'close_price']
+
+
+def frame(rows):
+    """Long ticker/date frame from (ticker, date, close, volume) rows; all prices equal the close"""
+    df = pd.DataFrame(rows, columns=['ticker', 'date', 'close_price', 'volume'])
+    df['date'] = pd.to_datetime(df['date'])
+    for col in PRICE_COLUMNS[:-1]:
+        df[col] = df['close_price']
+    return df[['ticker', 'date', *PRICE_COLUMNS, 'volume']]
+
+
+# Tue 2024-01-02 missing for AAA, Wed/Thu missing for BBB, CCC complete
+GAPPY = frame([
+    ('BBB', '2024-01-02', 20.0, 200.0),
+    ('AAA', '2024-01-01', 10.0, 100.0),
+    ('BBB', '2024-01-05', 26.0, 500.0),
+    ('AAA', '2024-01-03', 14.0, 300.0),
+    ('CCC', '2024-01-01', 5.0, 50.0),
+    ('AAA', '2024-01-04', 16.0, 400.0),
+    ('CCC', '2024-01-02', 6.0, 60.0),
+])
+
+
+def closes(df):
+    return {(ticker, str(date.date())): close
+            for ticker, date, close in df[['ticker', 'date', 'close_price']].itertuples(index=False)}
+
+
+def test_fill_missing_data_interpolates_business_day_gaps():
+    filled = fill_missing_data(GAPPY, method='interpolation')
+
+    assert closes(filled) == {
+        ('AAA', '2024-01-01'): 10.0, ('AAA', '2024-01-02'): 12.0,
+        ('AAA', '2024-01-03'): 14.0, ('AAA', '2024-01-04'): 16.0,
+        ('BBB', '2024-01-02'): 20.0, ('BBB', '2024-01-03'): 22.0,
+        ('BBB', '2024-01-04'): 24.0, ('BBB', '2024-01-05'): 26.0,
+        ('CCC', '2024-01-01'): 5.0, ('CCC', '2024-01-02'): 6.0,
+    }
+    assert list(filled['ticker']) == ['AAA'] * 4 + ['BBB'] * 4 + ['CCC'] * 2
+    bbb = filled[filled['ticker'] == 'BBB']
+    assert list(bbb['volume']) == [200.0, 300.0, 400.0, 500.0]
+    assert (bbb['open_price'] == bbb['close_price']).all()
+
+
+def test_fill_missing_data_forward_and_backward():
+    forward = fill_missing_data(GAPPY, method='forward')
+    backward = fill_missing_data(GAPPY, method='backward')
+
+    assert closes(forward)[('AAA', '2024-01-02')] == 10.0
+    assert closes(forward)[('BBB', '2024-01-04')] == 20.0
+    assert closes(backward)[('AAA', '2024-01-02')] == 14.0
+    assert closes(backward)[('BBB', '2024-01-03')] == 26.0
+
+
+def test_fill_missing_data_without_gaps_is_unchanged():
+    complete = GAPPY[GAPPY['ticker'] == 'CCC']
+    filled = fill_missing_data(complete)
+
+    pd.testing.assert_frame_equal(filled, complete.reset_index(drop=True))
+
+
+def test_calculate_metrics_matches_per_ticker_computation():
+    rng = np.random.default_rng(0)
+    rows = []
+    for ticker in ['BBB', 'AAA']:
+        dates = pd.bdate_range('2024-01-01', periods=45)
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates))))
+        rows += [(ticker, date, price, 1000.0) for date, price in zip(dates, prices)]
+    df = frame(rows).sample(frac=1, random_state=0)
+
+    metrics = calculate_metrics(df)
+
+    for ticker, data in metrics.groupby('ticker'):
+        expected = df[df['ticker'] == ticker].sort_values('date')
+        daily_return = expected['close_price'].pct_change()
+        np.testing.assert_allclose(data['daily_return'], daily_return)
+        np.testing.assert_allclose(data['cumulative_return'], (1 + daily_return).cumprod() - 1)
+        np.testing.assert_allclose(data['volatility'], daily_return.rolling(window=30).std())
+        assert data['volatility'].notna().sum() == 45 - 30
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import types
+
+import pandas as pd
+from mysql.connector import Error
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from symbol_cache import SymbolCache, yfinance_lookup
+
+
+class FakeCursor:
+    """Answers the stock_data query with `stock_data` and fails any symbol_metadata statement if asked"""
+
+    def __init__(self, stock_data=(), metadata_error=False):
+        self.stock_data = list(stock_data)
+        self.metadata_error = metadata_error
+        self.rows = []
+        self.upserts = []
+
+    def execute(self, query, params=None):
+        if 'FROM stock_data' in query:
+            self.rows = [(s,) for s in params if s in self.stock_data]
+        elif self.metadata_error:
+            raise Error("symbol_metadata is read-only")
+        else:
+            self.rows = []
+
+    def fetchall(self):
+        return self.rows
+
+    def executemany(self, query, rows):
+        self.upserts.extend(rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeConfig:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def get_connection(self):
+        return FakeConnection(self.cursor)
+
+
+def stub_download(monkeypatch, frame, errors=None):
+    yfinance = types.ModuleType('yfinance')
+    yfinance.download = lambda *args, **kwargs: frame
+    yfinance.shared = types.SimpleNamespace(_ERRORS=errors or {})
+    monkeypatch.setitem(sys.modules, 'yfinance', yfinance)
+
+
+def nan_closes(symbols):
+    columns = pd.MultiIndex.from_product([symbols, ['Close']])
+    return pd.DataFrame([[float('nan')] * len(symbols)], columns=columns)
+
+
+def test_failed_download_is_not_cached(monkeypatch):
+    stub_download(monkeypatch, pd.DataFrame())
+    cursor = FakeCursor()
+    cache = SymbolCache(FakeConfig(cursor))
+
+    assert cache.validate_many(['aapl', 'msft']) == {'AAPL': False, 'MSFT': False}
+    assert len(cache._lru) == 0
+    assert cursor.upserts == []
+
+
+def test_download_error_is_not_cached(monkeypatch):
+    stub_download(monkeypatch, nan_closes(['AAPL']),
+                  errors={'AAPL': "HTTPSConnectionPool(host='query2.finance.yahoo.com'): Read timed out."})
+    cursor = FakeCursor()
+    cache = SymbolCache(FakeConfig(cursor))
+
+    assert cache.validate('AAPL') is False
+    assert len(cache._lru) == 0
+    assert cursor.upserts == []
+
+
+def test_invalid_symbol_is_cached_as_invalid(monkeypatch):
+    stub_download(monkeypatch, nan_closes(['XXXX']),
+                  errors={'XXXX': 'possibly delisted; no price data found  (period=5d)'})
+    cursor = FakeCursor()
+    cache = SymbolCache(FakeConfig(cursor), ttl=1000, negative_ttl=10)
+
+    assert cache.validate('xxxx') is False
+    valid, expires_at = cache._lru['XXXX']
+    assert valid is False
+    assert expires_at - time.monotonic() <= 10
+    assert cursor.upserts == [('XXXX', False)]
+
+    # Answered from the LRU, without another download
+    stub_download(monkeypatch, pd.DataFrame())
+    assert cache.validate('XXXX') is False
+    assert cache.lru_hits == 1
+    assert cache.remote_lookups == 1
+
+
+def test_download_with_prices_is_cached(monkeypatch):
+    columns = pd.MultiIndex.from_product([['AAPL', 'XXXX'], ['Close']])
+    stub_download(monkeypatch, pd.DataFrame([[190.0, float('nan')]], columns=columns))
+    cursor = FakeCursor()
+    cache = SymbolCache(FakeConfig(cursor))
+
+    assert yfinance_lookup(['AAPL', 'XXXX']) == {'AAPL': True, 'XXXX': False}
+    assert cache.validate_many(['AAPL', 'XXXX']) == {'AAPL': True, 'XXXX': False}
+    assert set(cache._lru) == {'AAPL', 'XXXX'}
+    assert cursor.upserts == [('AAPL', True), ('XXXX', False)]
+
+
+def test_stock_data_hits_survive_metadata_errors():
+    cursor = FakeCursor(stock_data=['AAPL'], metadata_error=True)
+    cache = SymbolCache(FakeConfig(cursor), lookup=lambda symbols: {'MSFT': True})
+
+    assert cache.validate_many(['AAPL', 'MSFT']) == {'AAPL': True, 'MSFT': True}
+    assert cache.db_hits == 1
+    assert cache.remote_lookups == 1